@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compare XML-RPC and JSON-RPC marshalling cost for Odoo read payloads
+
+Usage::
+    python benchmark_odoo_rpc.py            # synthetic product.template payloads
+    python benchmark_odoo_rpc.py --live     # also read real templates via OdooConnector
+"""
+import base64
+import json
+import os
+import sys
+import timeit
+import xmlrpc.client
+
+# Same field list sync_product_updates() reads for every template
+TEMPLATE_FIELDS = [
+    "name", "list_price", "standard_price", "type", "qty_available",
+    "product_tag_ids", "default_code", "id", "write_date", "weight",
+    "taxes_id", "supplier_taxes_id", "categ_id",
+    "image_1920", "image_1024", "image_512", "active",
+]
+
+
+def make_template(i, image_bytes=0):
+    image = base64.b64encode(os.urandom(image_bytes)).decode() if image_bytes else False
+    return {
+        "id": i,
+        "name": "Product %d - Cotton shirt, long sleeves" % i,
+        "list_price": 199.0 + i,
+        "standard_price": 80.5,
+        "type": "product",
+        "qty_available": float(i % 40),
+        "product_tag_ids": [1, 4, 7],
+        "default_code": "SKU-%06d" % i,
+        "write_date": "2024-07-14 14:17:%02d" % (i % 60),
+        "weight": 0.35,
+        "taxes_id": [1],
+        "supplier_taxes_id": [2],
+        "categ_id": [12, "All / Saleable / Shirts"],
+        "image_1920": image,
+        "image_1024": image,
+        "image_512": image,
+        "active": True,
+    }
+
+
+def xmlrpc_encode(records):
+    return xmlrpc.client.dumps((records,), methodresponse=True).encode("utf-8")
+
+
+def xmlrpc_decode(body):
+    return xmlrpc.client.loads(body)[0][0]
+
+
+def jsonrpc_encode(records):
+    return json.dumps({"jsonrpc": "2.0", "id": 1, "result": records}).encode("utf-8")
+
+
+def jsonrpc_decode(body):
+    return json.loads(body)["result"]
+
+
+def bench(label, records, repeat=5):
+    print(f"\n📦 {label} ({len(records)} records)")
+    for name, encode, decode in (
+        ("xmlrpc ", xmlrpc_encode, xmlrpc_decode),
+        ("jsonrpc", jsonrpc_encode, jsonrpc_decode),
+    ):
+        body = encode(records)
+        number = max(1, 2000 // max(1, len(records)))
+        enc = min(timeit.repeat(lambda: encode(records), number=number, repeat=repeat)) / number
+        dec = min(timeit.repeat(lambda: decode(body), number=number, repeat=repeat)) / number
+        print(f"  {name}  encode {enc * 1000:8.3f} ms   decode {dec * 1000:8.3f} ms   wire {len(body):>10,} bytes")
+
+
+def main():
+    bench("templates without images", [make_template(i) for i in range(50)])
+    bench("templates with 20KB images", [make_template(i, 20 * 1024) for i in range(20)])
+    bench("single record", [make_template(1)])
+
+    if "--live" in sys.argv:
+        from helpers.odoo_connector import OdooConnector
+
+        connector = OdooConnector.shared()
+        ids = connector.search("product.template", [], limit=20)
+        bench("live product.template read", connector.read("product.template", ids, TEMPLATE_FIELDS))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,79 +5,92 @@ Enhanced product sync with quantity and image change detection
 import sys
 import os
 from datetime import datetime, timedelta
+from itertools import islice
 from time import sleep
 
 sys.path.insert(0, 'helpers/')
 
+from helpers.catalog_index import CatalogIndex
 from helpers.file_helper import read_time_stamp, write_time_stamp
-from helpers.helpers import flatten, odooReadSearch
+from helpers.helpers import flatten, odooReadSearchPages
 from helpers.odoo_connector import OdooConnector
 from helpers.product_helpers import ProductHelper
 from helpers.sql_connector import SQLConnector
 
+# Laravel products compared against Odoo per round trip
+QUANTITY_SCAN_BATCH = 500
+
+def sync_quantity_batch(connector, sql_connector, synced_products, catalog):
+    """Compare one batch of Laravel products with Odoo and fix quantities"""
+    # Get Odoo product IDs
+    odoo_ids = [int(p['remote_key_id']) for p in synced_products]
+    
+    # Fetch current quantities from Odoo; records are decoded one by one
+    # when response streaming is on, otherwise OdooConnector.read splits
+    # the id list into chunks and reads them in parallel
+    updated_count = 0
+    odoo_products = connector.iter_read(
+        'product.template',
+        odoo_ids,
+        ['id', 'qty_available', 'write_date']
+    )
+    
+    for odoo_product in odoo_products:
+        # Find corresponding Laravel product
+        laravel_product = catalog.product(odoo_product['id'])
+        
+        if laravel_product:
+            odoo_qty = int(odoo_product['qty_available'])
+            laravel_qty = int(laravel_product['qty'])
+            
+            if odoo_qty != laravel_qty:
+                print(f"🔄 Quantity change detected:")
+                print(f"   Product: {laravel_product['name']}")
+                print(f"   Laravel QTY: {laravel_qty} → Odoo QTY: {odoo_qty}")
+                
+                # Update Laravel quantity
+                sql_connector.update(
+                    "products",
+                    "`id` = %s",
+                    {"qty": odoo_qty},
+                    [laravel_product['id']],
+                )
+                catalog.put_product(odoo_product['id'], qty=odoo_qty)
+                
+                # Also update variants
+                update_variant_quantities(connector, sql_connector, odoo_product['id'], laravel_product['id'])
+                
+                updated_count += 1
+                print(f"   ✅ Updated quantity: {laravel_qty} → {odoo_qty}")
+    
+    return updated_count
+
 def detect_quantity_changes(connector, sql_connector, helper, limit=100):
     """Detect and sync products with quantity changes"""
     print("\n🔢 Detecting quantity changes...")
     
     try:
-        # Get all synced products from Laravel
-        synced_products = sql_connector.getAll(
-            "products", 
-            "`remote_key_id` IS NOT NULL AND `remote_key_id` != ''"
-        ).fetch()
-        
-        if not synced_products:
+        # Synced products from the cycle's catalog index (streamed from
+        # Laravel with a narrow projection when it was loaded)
+        catalog = helper.catalog
+        if catalog is None:
+            catalog = helper.catalog = CatalogIndex(sql_connector).load()
+        synced_rows = iter(list(catalog.products.values()))
+        
+        checked_count = 0
+        updated_count = 0
+        while True:
+            synced_products = list(islice(synced_rows, QUANTITY_SCAN_BATCH))
+            if not synced_products:
+                break
+            checked_count += len(synced_products)
+            updated_count += sync_quantity_batch(connector, sql_connector, synced_products, catalog)
+        
+        if checked_count == 0:
             print("❌ No synced products found")
             return 0
         
-        print(f"📊 Checking {len(synced_products)} synced products for quantity changes")
-        
-        # Get Odoo product IDs
-        odoo_ids = [int(p['remote_key_id']) for p in synced_products]
-        
-        # Fetch current quantities from Odoo in batches
-        batch_size = 50
-        updated_count = 0
-        
-        for i in range(0, len(odoo_ids), batch_size):
-            batch_ids = odoo_ids[i:i + batch_size]
-            
-            # Get current Odoo quantities
-            odoo_products = connector.read(
-                'product.template',
-                batch_ids,
-                ['id', 'qty_available', 'write_date']
-            )
-            
-            for odoo_product in odoo_products:
-                # Find corresponding Laravel product
-                laravel_product = next(
-                    (p for p in synced_products if int(p['remote_key_id']) == odoo_product['id']), 
-                    None
-                )
-                
-                if laravel_product:
-                    odoo_qty = int(odoo_product['qty_available'])
-                    laravel_qty = int(laravel_product['qty'])
-                    
-                    if odoo_qty != laravel_qty:
-                        print(f"🔄 Quantity change detected:")
-                        print(f"   Product: {laravel_product['name']}")
-                        print(f"   Laravel QTY: {laravel_qty} → Odoo QTY: {odoo_qty}")
-                        
-                        # Update Laravel quantity
-                        sql_connector.update(
-                            "products",
-                            f"`id` = '{laravel_product['id']}'",
-                            {"qty": odoo_qty}
-                        )
-                        
-                        # Also update variants
-                        update_variant_quantities(connector, sql_connector, odoo_product['id'], laravel_product['id'])
-                        
-                        updated_count += 1
-                        print(f"   ✅ Updated quantity: {laravel_qty} → {odoo_qty}")
-        
+        print(f"📊 Checked {checked_count} synced products for quantity changes")
         print(f"🎉 Updated {updated_count} products with quantity changes")
         return updated_count
         
@@ -100,73 +113,86 @@ def update_variant_quantities(connector, sql_connector, template_id, laravel_pro
                 # Update Laravel variant
                 sql_connector.update(
                     "product_variants",
-                    f"`product_id` = '{laravel_product_id}' AND `remote_key_id` = '{variant['id']}'",
-                    {"stock": variant['qty_available']}
+                    "`product_id` = %s AND `remote_key_id` = %s",
+                    {"stock": variant['qty_available']},
+                    [laravel_product_id, str(variant['id'])],
                 )
                 
     except Exception as e:
         print(f"⚠️  Variant quantity update failed for template {template_id}: {str(e)}")
 
+# Gallery checksums seen per Odoo template during this process' lifetime
+_gallery_signatures = {}
+
 def detect_image_changes(connector, sql_connector, helper, limit=100):
     """Detect and sync products with image changes"""
     print("\n🖼️  Detecting image changes...")
     
     try:
+        catalog = helper.catalog
+        if catalog is None:
+            catalog = helper.catalog = CatalogIndex(sql_connector).load()
+        
         # Get products that might have image changes (recently updated)
         last_sync_at = read_time_stamp("product_time_stamp.txt")
         
         # Get products updated in the last 2 hours (more frequent for images)
         recent_time = (datetime.now() - timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
         
-        updated_products = odooReadSearch(
+        image_fields = ProductHelper.TEMPLATE_IMAGE_FIELDS + ProductHelper.GALLERY_IMAGE_FIELDS
+        updated_pages = odooReadSearchPages(
             connector,
             "product.template",
-            where_clause=["write_date", ">=", recent_time],
-            sFields=[
-                "id", "name", "write_date", 
-                "image_1920", "image_1024", "image_512",
-                # Gallery image fields
-                "image_1", "image_2", "image_3", "image_4", "image_5",
-                "image_6", "image_7", "image_8", "image_9", "image_10"
-            ],
+            [("write_date", ">=", recent_time)],
+            sFields=["id", "name", "write_date"],
+            page_size=20,
             limit=limit
         )
         
-        if not updated_products:
-            print("❌ No recently updated products found")
-            return 0
-        
-        print(f"📊 Checking {len(updated_products)} recently updated products for image changes")
-        
         updated_count = 0
+        checked_count = 0
         
-        for product in updated_products:
-            try:
-                # Check if this product exists in Laravel
-                laravel_product = sql_connector.getOne(
-                    "products", 
-                    f"`remote_key_id` = '{product['id']}'"
-                ).fetch()
-                
-                if not laravel_product:
+        for page in updated_pages:
+            # Which images exist (and their checksums) without downloading them
+            helper.apply_image_manifest(page, image_fields)
+            
+            for product in page:
+                checked_count += 1
+                try:
+                    # Check if this product exists in Laravel
+                    laravel_product = catalog.product(product['id'])
+                    
+                    if not laravel_product:
+                        continue
+                    
+                    print(f"\n🔍 Checking images for: {product['name']} (ID: {product['id']})")
+                    
+                    # Check main image change
+                    main_image_changed = check_main_image_change(product, laravel_product, helper)
+                    
+                    # Check gallery image changes, skipping the resync when the
+                    # gallery checksums are the same as last time we looked
+                    gallery_changed = False
+                    signature = ProductHelper.image_signature(product, ProductHelper.GALLERY_IMAGE_FIELDS)
+                    if _gallery_signatures.get(product['id']) != signature:
+                        gallery_changed = check_gallery_image_changes(product, laravel_product, helper, sql_connector)
+                        _gallery_signatures[product['id']] = signature
+                    else:
+                        print(f"  ✅ Gallery unchanged")
+                    
+                    if main_image_changed or gallery_changed:
+                        updated_count += 1
+                        print(f"✅ Updated images for: {product['name']}")
+                    
+                except Exception as e:
+                    print(f"⚠️  Error checking images for product {product.get('id', 'unknown')}: {str(e)}")
                     continue
-                
-                print(f"\n🔍 Checking images for: {product['name']} (ID: {product['id']})")
-                
-                # Check main image change
-                main_image_changed = check_main_image_change(product, laravel_product, helper)
-                
-                # Check gallery image changes
-                gallery_changed = check_gallery_image_changes(product, laravel_product, helper, sql_connector)
-                
-                if main_image_changed or gallery_changed:
-                    updated_count += 1
-                    print(f"✅ Updated images for: {product['name']}")
-                
-            except Exception as e:
-                print(f"⚠️  Error checking images for product {product.get('id', 'unknown')}: {str(e)}")
-                continue
         
+        if checked_count == 0:
+            print("❌ No recently updated products found")
+            return 0
+        
+        print(f"📊 Checked {checked_count} recently updated products for image changes")
         print(f"🎉 Updated {updated_count} products with image changes")
         return updated_count
         
@@ -198,9 +224,12 @@ def check_main_image_change(odoo_product, laravel_product, helper):
                     # Update Laravel product
                     helper.sql_connector.update(
                         "products",
-                        f"`id` = '{laravel_product['id']}'",
-                        {"thumb_image": new_image_url}
+                        "`id` = %s",
+                        {"thumb_image": new_image_url},
+                        [laravel_product['id']],
                     )
+                    if helper.catalog is not None:
+                        helper.catalog.put_product(odoo_product['id'], thumb_image=new_image_url)
                     print(f"     ✅ Main image updated")
                     return True
                 else:
@@ -220,7 +249,7 @@ def check_gallery_image_changes(odoo_product, laravel_product, helper, sql_conne
         print(f"  🖼️  Checking gallery images...")
         
         # Re-sync gallery (this will detect additions/removals)
-        gallery_count = helper.sync_product_gallery(odoo_product['id'], laravel_product['id'])
+        gallery_count = helper.sync_product_gallery(odoo_product['id'], laravel_product['id'], template=odoo_product)
         
         if gallery_count > 0:
             print(f"  ✅ Gallery updated: {gallery_count} images")
@@ -237,17 +266,21 @@ def enhanced_product_sync_runner():
     print("🚀 Starting enhanced product sync with change detection...")
     
     try:
-        connector = OdooConnector()
+        connector = OdooConnector.shared()
         sql_connector = SQLConnector()
         helper = ProductHelper(connector, sql_connector)
         
+        # Laravel side of the catalog, read once per cycle and kept current
+        # by the writes below
+        helper.catalog = CatalogIndex(sql_connector).load()
+        
         # 1. Regular product sync (for new products and major changes)
         print("\n" + "="*60)
         print("1️⃣  REGULAR PRODUCT SYNC")
         print("="*60)
         
         from product_service_runner import sync_product_updates
-        sync_product_updates(connector, sql_connector, helper, limit=20)
+        sync_product_updates(connector, sql_connector, helper)
         
         # 2. Quantity change detection
         print("\n" + "="*60)
@@ -0,0 +1,68 @@
+import time
+
+
+class CatalogIndex:
+    """Synced Laravel products and variants keyed by their Odoo id.
+
+    Loaded once per sync cycle with a narrow projection, streamed through
+    ``SQLConnector.iter_rows``, so matching Odoo records to Laravel rows is
+    a dict lookup instead of a query or a scan per record. Products are
+    keyed by ``remote_key_id`` and variants by ``(product_id,
+    remote_key_id)``, both as strings like the columns. Whoever writes
+    during the cycle calls ``put_product``/``put_variant`` so the index
+    keeps matching the tables.
+    """
+
+    PRODUCT_COLUMNS = ["id", "remote_key_id", "name", "qty", "thumb_image", "status"]
+    VARIANT_COLUMNS = ["id", "product_id", "remote_key_id", "stock", "status"]
+    SYNCED = "`remote_key_id` IS NOT NULL AND `remote_key_id` != ''"
+
+    def __init__(self, sql_connector):
+        self.sql_connector = sql_connector
+        self.products = {}
+        self.variants = {}
+        self.loaded_at = None
+
+    def load(self):
+        started = time.monotonic()
+        products = {}
+        for row in self.sql_connector.iter_rows("products", self.SYNCED, columns=self.PRODUCT_COLUMNS):
+            products[str(row["remote_key_id"])] = row
+        variants = {}
+        for row in self.sql_connector.iter_rows("product_variants", self.SYNCED, columns=self.VARIANT_COLUMNS):
+            variants[(row["product_id"], str(row["remote_key_id"]))] = row
+        self.products = products
+        self.variants = variants
+        self.loaded_at = time.time()
+        print("[catalog] indexed %d products and %d variants in %.0fms" % (
+            len(products), len(variants), (time.monotonic() - started) * 1000))
+        return self
+
+    def product(self, remote_key_id):
+        return self.products.get(str(remote_key_id))
+
+    def variant(self, product_id, remote_key_id):
+        return self.variants.get((product_id, str(remote_key_id)))
+
+    def put_product(self, remote_key_id, **values):
+        """Record a write to the product synced from Odoo ``remote_key_id``"""
+        key = str(remote_key_id)
+        row = self.products.get(key)
+        if row is None:
+            row = self.products[key] = {"remote_key_id": key}
+        row.update(values)
+        return row
+
+    def put_variant(self, product_id, remote_key_id, **values):
+        key = (product_id, str(remote_key_id))
+        row = self.variants.get(key)
+        if row is None:
+            row = self.variants[key] = {"product_id": product_id, "remote_key_id": key[1]}
+        row.update(values)
+        return row
+
+    def __len__(self):
+        return len(self.products)
+
+    def stats(self):
+        return {"products": len(self.products), "variants": len(self.variants)}
@@ -1,5 +1,6 @@
 # write down a file with current time stamp as iso format
 import datetime
+import json
 import os
 
 
@@ -36,3 +37,51 @@ def read_time_stamp(file_name):
         write_time_stamp(file_name)
         read_time_stamp(file_name)
         
+
+
+def read_watermark(file_name):
+    """Keyset cursor ``(write_date, last_id, ids)`` a change feed has fully
+    processed (see helpers._keyset_query), or None"""
+    path = get_file_name(file_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        data = json.loads(read_file(path))
+        if "ids" not in data:
+            # Saved as a single (write_date, id) before
+            return data["write_date"], 0, [int(data["id"])]
+        last_id = data.get("last_id", 0)
+        return (
+            data["write_date"],
+            None if last_id is None else int(last_id),
+            [int(record_id) for record_id in data["ids"]],
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"[watermark] ignoring unreadable {file_name}: {str(e)}")
+        return None
+
+
+def read_watermark_retries(file_name):
+    """Record ids saved with the watermark because they failed, or []"""
+    path = get_file_name(file_name)
+    if not os.path.exists(path):
+        return []
+    try:
+        return [int(record_id) for record_id in json.loads(read_file(path)).get("retry_ids", [])]
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"[watermark] ignoring unreadable retries in {file_name}: {str(e)}")
+        return []
+
+
+def write_watermark(file_name, cursor, retry_ids=()):
+    # Write then rename so a crash never leaves a truncated watermark behind
+    write_date, last_id, record_ids = cursor
+    path = get_file_name(file_name)
+    write_file(path + ".tmp", json.dumps({
+        "write_date": write_date,
+        "last_id": last_id,
+        "ids": list(record_ids),
+        "retry_ids": list(retry_ids),
+        "saved_at": get_time(),
+    }))
+    os.replace(path + ".tmp", path)
@@ -2,6 +2,7 @@ import json
 import os
 import uuid
 import xmlrpc.client
+from datetime import datetime, timedelta
 
 from dotenv import load_dotenv
 from IPython.display import HTML
@@ -40,4 +41,142 @@ def odooReadSearch(connector: OdooConnector, model, where_clause=(), sFields=[],
         sFields = fields.keys()
         sFields = list(sFields)
     search_ids = connector.search(model, [where_clause], offset=offset, limit=limit)
-    return connector.read(model, search_ids, sFields)
\ No newline at end of file
+    return connector.read(model, search_ids, sFields)
+
+
+def normalize_domain(domain):
+    """Accept a single ``(field, op, value)`` leaf or a full Odoo domain."""
+    if not domain:
+        return []
+    if isinstance(domain, (list, tuple)) and len(domain) == 3 and isinstance(domain[0], str) \
+            and domain[0] not in ("&", "|", "!"):
+        return [tuple(domain)]
+    return list(domain)
+
+
+def _keyset_fields(connector: OdooConnector, model, sFields):
+    if not sFields:
+        sFields = list(connector.get_model_fields(model).keys())
+    sFields = list(sFields)
+    for key in ("id", "write_date"):
+        if key not in sFields:
+            sFields.append(key)
+    return sFields
+
+
+KEYSET_ORDER = "write_date asc, id asc"
+
+
+def _next_second(write_date):
+    return (datetime.strptime(write_date, "%Y-%m-%d %H:%M:%S") + timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _keyset_query(domain, cursor):
+    """``(domain, order)`` of the page after ``cursor``.
+
+    Odoo stores ``write_date`` with microseconds but returns it and compares
+    domain values at whole seconds, so a page cannot resume in the middle of
+    a second by date alone. A cursor is ``(write_date, last_id, seen_ids)``:
+
+    - ``last_id`` None: every record before ``write_date`` is done, the scan
+      goes on in ``write_date, id`` order from that second on;
+    - otherwise the scan is inside the second ``write_date``, in id order:
+      ids up to ``last_id`` and the ids in ``seen_ids`` are done.
+    """
+    if cursor is None:
+        return domain, KEYSET_ORDER
+    write_date, last_id, seen_ids = cursor
+    if last_id is None:
+        return domain + [("write_date", ">=", write_date)], KEYSET_ORDER
+    domain = domain + [
+        ("write_date", ">=", write_date),
+        ("write_date", "<", _next_second(write_date)),
+        ("id", ">", last_id),
+    ]
+    if seen_ids:
+        domain.append(("id", "not in", list(seen_ids)))
+    return domain, "id asc"
+
+
+def _advance_cursor(cursor, records, size):
+    """Cursor after a page of ``records`` asked with ``limit=size``, and
+    whether the scan is over"""
+    if cursor is not None and cursor[1] is not None:
+        write_date, last_id, seen_ids = cursor
+        if len(records) < size:
+            # That second is done, carry on with the next ones
+            return (_next_second(write_date), None, []), False
+        last_id = records[-1]["id"]
+        return (write_date, last_id, [i for i in seen_ids if i > last_id]), False
+    if not records:
+        return cursor, True
+    # A page in write_date order ends in the middle of its last second: a
+    # later transaction of that second can still hold smaller ids, so the
+    # rest of it is read in id order, leaving out the (at most one page of)
+    # ids already returned. One transaction's records then page on id alone.
+    last_date = records[-1]["write_date"]
+    seen_ids = [record["id"] for record in records if record["write_date"] == last_date]
+    return (last_date, 0, seen_ids), len(records) < size
+
+
+def odooReadSearchPages(connector: OdooConnector, model, domain=(), sFields=[], page_size=200, limit=0, cursor=None,
+                        with_cursor=False):
+    """Yield ``search_read`` pages ordered by ``(write_date, id)``.
+
+    Each page costs one RPC. Instead of growing offsets, the next page starts
+    from a keyset cursor (see ``_keyset_query``), so pages stay cheap and
+    records edited mid-scan are neither skipped nor repeated. Pass ``cursor``
+    to resume from a cursor saved by an earlier scan; ``with_cursor`` yields
+    ``(page, cursor)`` pairs where ``cursor`` resumes right after ``page``.
+    """
+    domain = normalize_domain(domain)
+    sFields = _keyset_fields(connector, model, sFields)
+
+    fetched = 0
+    while True:
+        size = page_size if not limit else min(page_size, limit - fetched)
+        if size <= 0:
+            return
+        query, order = _keyset_query(domain, cursor)
+        page = connector.search_read(model, query, sFields, limit=size, order=order)
+        next_cursor, done = _advance_cursor(cursor, page, size)
+        if page:
+            fetched += len(page)
+            yield (page, next_cursor) if with_cursor else page
+        if done:
+            return
+        if next_cursor == cursor:
+            print(f"[odoo.keyset] {model} page did not move the cursor, stopping")
+            return
+        cursor = next_cursor
+
+
+def odooReadSearchIter(connector: OdooConnector, model, domain=(), sFields=[], page_size=200, limit=0):
+    """Stream records one by one, fetching them page by page.
+
+    When the connector streams responses, records are handed out while their
+    page is still being decoded.
+    """
+    domain = normalize_domain(domain)
+    sFields = _keyset_fields(connector, model, sFields)
+
+    fetched = 0
+    cursor = None
+    while True:
+        size = page_size if not limit else min(page_size, limit - fetched)
+        if size <= 0:
+            return
+        # Only the keys are kept to advance the cursor, not the records
+        keys = []
+        query, order = _keyset_query(domain, cursor)
+        for record in connector.iter_search_read(model, query, sFields, limit=size, order=order):
+            keys.append({"write_date": record["write_date"], "id": record["id"]})
+            yield record
+        fetched += len(keys)
+        next_cursor, done = _advance_cursor(cursor, keys, size)
+        if done:
+            return
+        if next_cursor == cursor:
+            print(f"[odoo.keyset] {model} page did not move the cursor, stopping")
+            return
+        cursor = next_cursor
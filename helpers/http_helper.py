@@ -2,7 +2,7 @@ import json
 from django.http import HttpResponseBadRequest
 
 from helpers import odoo_connector
-from helpers.odoo_connector import OdooConnector
+from helpers.odoo_connector import OdooConnector, OdooUnavailable
 from helpers.salesorder_helpers import SalesOrderHelper
 from helpers.sql_connector import SQLConnector
 
@@ -15,8 +15,17 @@ class HttpHelper:
 
     def __init__(self, requestHandler):
         self.requestHandler = requestHandler
-        self.odoo_connector = OdooConnector()
-        self.sql_connector = SQLConnector()
+        self.odoo_connector = None
+        self.sql_connector = None
+
+    def connect(self):
+        # Called inside the handlers' try blocks, so a failure still gets
+        # a response (503 while Odoo is unavailable)
+        if self.odoo_connector is None:
+            self.odoo_connector = OdooConnector.shared()
+        if self.sql_connector is None:
+            self.sql_connector = SQLConnector()
+        return self
 
 
 
@@ -37,6 +46,7 @@ class HttpHelper:
 
     def onPOST(self, body):
         try: 
+            self.connect()
             body = json.loads(body.decode('utf-8'))
             data = None
             
@@ -85,11 +95,14 @@ class HttpHelper:
             
             return self.sendJsonResponse({"error": "404"}, 404)
         
+        except OdooUnavailable as e:
+            return self.sendJsonResponse({"error": str(e)}, 503)
         except Exception as e:
             return self.sendJsonResponse({"error": str(e)}, 400)
 
     def onPut(self, body):
         try: 
+            self.connect()
             body = json.loads(body.decode('utf-8'))
             data = None
             
@@ -103,6 +116,8 @@ class HttpHelper:
             
             return self.sendJsonResponse({"error": "404"}, 404)
         
+        except OdooUnavailable as e:
+            return self.sendJsonResponse({"error": str(e)}, 503)
         except Exception as e:
             return self.sendJsonResponse({"error": str(e)}, 400)
 
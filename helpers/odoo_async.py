@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import weakref
+
+from helpers.odoo_connector import OdooConnector, odoo_configs
+
+
+class AsyncOdooConnector:
+    """Coroutine flavour of OdooConnector for overlapping independent RPCs.
+
+    Each call runs the blocking connector method on the event loop's thread
+    pool; the pooled keep-alive transport is thread-safe, so up to
+    ``concurrency`` requests are in flight at once instead of being paid one
+    after another. Usage from synchronous code::
+
+        async_connector = AsyncOdooConnector(connector)
+        ids_per_sku = asyncio.run(async_connector.gather_searches("product.product", domains, limit=1))
+    """
+
+    def __init__(self, connector: OdooConnector = None, concurrency=None):
+        self.connector = connector or OdooConnector.shared()
+        self.concurrency = concurrency or odoo_configs().async_concurrency
+        # asyncio primitives are bound to one loop; asyncio.run() makes a new
+        # loop every time, so keep one semaphore per loop.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def _run(self, method, *args, **kwargs):
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(method, *args, **kwargs))
+
+    async def execute_kw(self, model, method, args, kwargs=None):
+        return await self._run(self.connector.execute_kw, model, method, args, kwargs)
+
+    async def search(self, model, domain, offset=0, limit=0):
+        return await self._run(self.connector.search, model, domain, offset=offset, limit=limit)
+
+    async def read(self, model, ids, fields):
+        return await self._run(self.connector.read, model, ids, fields)
+
+    async def search_read(self, model, domain, fields, offset=0, limit=0, order=None):
+        return await self._run(self.connector.search_read, model, domain, fields, offset=offset, limit=limit, order=order)
+
+    async def write(self, model, ids, values):
+        return await self._run(self.connector.write, model, ids, values)
+
+    async def create(self, model, values):
+        return await self._run(self.connector.create, model, values)
+
+    async def unlink(self, model, ids):
+        return await self._run(self.connector.unlink, model, ids)
+
+    async def get_model_fields(self, model):
+        return await self._run(self.connector.get_model_fields, model)
+
+    async def gather_reads(self, model, id_groups, fields):
+        """Read several id lists concurrently, results in input order"""
+        return await asyncio.gather(*(self.read(model, ids, fields) for ids in id_groups))
+
+    async def gather_searches(self, model, domains, offset=0, limit=0):
+        """Run several searches concurrently, results in input order"""
+        return await asyncio.gather(*(self.search(model, domain, offset=offset, limit=limit) for domain in domains))
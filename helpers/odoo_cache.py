@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from helpers.file_helper import get_file_name
+
+
+class ModelMetadataCache:
+    """``fields_get`` results kept in memory and on disk with a TTL.
+
+    Model metadata only changes when modules are installed or upgraded, yet
+    ``fields_get`` is one of the heaviest calls Odoo serves. Entries are keyed
+    by Odoo URL, database, model and requested attributes, and persisted to a
+    JSON file so a restarted worker does not fetch them again.
+    """
+
+    def __init__(self, path=".odoo_metadata_cache.json", ttl=86400):
+        self.path = get_file_name(path) if path else None
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    @staticmethod
+    def key(url, db, model, attributes=()):
+        return "|".join([url or "", db or "", model, ",".join(sorted(attributes or ()))])
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[odoo.metadata] ignoring unreadable cache {self.path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[odoo.metadata] could not persist cache: {str(e)}")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["stored_at"] > self.ttl:
+                del self._entries[key]
+                return None
+            return entry["value"]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = {"stored_at": time.time(), "value": value}
+            self._save()
+        return value
+
+    def invalidate(self, model=None):
+        """Drop one model's entries, or everything when ``model`` is None."""
+        with self._lock:
+            if model is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.split("|")[2] == model]:
+                    del self._entries[key]
+            self._save()
+
+
+class RecordCache:
+    """Bounded LRU of Odoo records validated against ``write_date``.
+
+    One entry per (model, id) holds every cacheable field read so far; a
+    lookup for a field set is a hit when the entry has all of those fields
+    and its ``write_date`` still matches Odoo's. Only fields Odoo stores are
+    kept (``stored``, from ``fields_get``): computed fields change without
+    touching their record's ``write_date``. Stock quantities, prices and
+    images are never kept either, and reads asking for any of those bypass
+    the cache.
+
+    ``write_date`` only has whole seconds, so a second write in the same
+    second would go unnoticed; records written less than ``settle_seconds``
+    ago are therefore not cached at all.
+    """
+
+    VOLATILE_FIELDS = {
+        "qty_available", "virtual_available", "free_qty", "incoming_qty", "outgoing_qty",
+        "lst_price", "price",
+    }
+
+    def __init__(self, max_entries=5000, settle_seconds=60):
+        self.max_entries = max_entries
+        self.settle_seconds = settle_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @classmethod
+    def cacheable_field(cls, field, stored):
+        return field in stored and field not in cls.VOLATILE_FIELDS and not field.startswith("image_")
+
+    @classmethod
+    def cacheable(cls, fields, stored):
+        return bool(fields) and all(cls.cacheable_field(f, stored) for f in fields)
+
+    def settled(self, write_date):
+        """Whether ``write_date`` (UTC, as Odoo returns it) is old enough to
+        tell every later write apart"""
+        try:
+            written = datetime.strptime(write_date, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return False
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return now - written >= timedelta(seconds=self.settle_seconds)
+
+    def get(self, model, record_id, fields, write_date):
+        with self._lock:
+            entry = self._entries.get((model, record_id))
+            if entry is None or any(f not in entry for f in fields):
+                self.misses += 1
+                return None
+            if entry.get("write_date") != write_date:
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model, record_id))
+            self.hits += 1
+            record = {"id": record_id}
+            record.update({f: entry[f] for f in fields})
+            return record
+
+    def put(self, model, record, stored):
+        if "id" not in record or "write_date" not in record or not self.settled(record["write_date"]):
+            return
+        values = {f: v for f, v in record.items() if f in ("id", "write_date") or self.cacheable_field(f, stored)}
+        key = (model, record["id"])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.get("write_date") == record["write_date"]:
+                entry.update(values)
+                self._entries.move_to_end(key)
+            else:
+                self._entries[key] = values
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, model, ids=None):
+        with self._lock:
+            if ids is None:
+                for key in [k for k in self._entries if k[0] == model]:
+                    del self._entries[key]
+                return
+            for record_id in ids:
+                self._entries.pop((model, record_id), None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / total, 3) if total else 0,
+                "size": len(self._entries),
+            }
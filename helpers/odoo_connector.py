@@ -1,10 +1,22 @@
 
+import http.client
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import xmlrpc.client
+from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 
+from helpers.odoo_cache import ModelMetadataCache, RecordCache
+from helpers.odoo_stats import RpcStats
+from helpers.odoo_jsonrpc import JsonRpcProxy, JsonRpcTransport
+from helpers.odoo_limiter import AdaptiveLimiter, CircuitBreaker, OdooUnavailable, SlotTimeout, TokenBucket
+from helpers.odoo_transport import PoolExhausted, PooledTransport
+
 load_dotenv()
 
 class odoo_configs:
@@ -12,61 +24,561 @@ class odoo_configs:
     db = os.getenv("ODOO_DB")
     username = os.getenv("ODOO_USER")
     password = os.getenv("ODOO_PASS")
+    pool_size = int(os.getenv("ODOO_POOL_SIZE", "4"))
+    timeout = float(os.getenv("ODOO_TIMEOUT", "60"))
+    idle_timeout = float(os.getenv("ODOO_POOL_IDLE_TIMEOUT", "30"))
+    protocol = os.getenv("ODOO_PROTOCOL", "xmlrpc")
+    metadata_cache_path = os.getenv("ODOO_METADATA_CACHE_PATH", ".odoo_metadata_cache.json")
+    metadata_cache_ttl = float(os.getenv("ODOO_METADATA_CACHE_TTL", "86400"))
+    async_concurrency = int(os.getenv("ODOO_ASYNC_CONCURRENCY", os.getenv("ODOO_POOL_SIZE", "4")))
+    read_chunk_size = int(os.getenv("ODOO_READ_CHUNK_SIZE", "200"))
+    read_parallelism = int(os.getenv("ODOO_READ_PARALLELISM", "4"))
+    record_cache_size = int(os.getenv("ODOO_RECORD_CACHE_SIZE", "5000"))
+    record_cache_models = os.getenv("ODOO_RECORD_CACHE_MODELS", "product.template,product.product")
+    record_cache_settle = float(os.getenv("ODOO_RECORD_CACHE_SETTLE", "60"))
+    stream_responses = os.getenv("ODOO_STREAM_RESPONSES", "0") == "1"
+    min_concurrency = int(os.getenv("ODOO_MIN_CONCURRENCY", "1"))
+    max_concurrency = int(os.getenv("ODOO_MAX_CONCURRENCY", os.getenv("ODOO_POOL_SIZE", "4")))
+    latency_target = float(os.getenv("ODOO_LATENCY_TARGET", "2"))
+    max_calls_per_second = float(os.getenv("ODOO_MAX_CALLS_PER_SECOND", "0"))
+    call_deadline = float(os.getenv("ODOO_CALL_DEADLINE", "120"))
+    retries = int(os.getenv("ODOO_RETRIES", "3"))
+    retry_backoff = float(os.getenv("ODOO_RETRY_BACKOFF", "0.5"))
+    retry_backoff_max = float(os.getenv("ODOO_RETRY_BACKOFF_MAX", "8"))
+    breaker_threshold = int(os.getenv("ODOO_BREAKER_THRESHOLD", "5"))
+    breaker_reset = float(os.getenv("ODOO_BREAKER_RESET", "30"))
+    gzip_responses = os.getenv("ODOO_GZIP_RESPONSES", "1") == "1"
+    gzip_request_threshold = int(os.getenv("ODOO_GZIP_REQUEST_THRESHOLD", "0"))
     
     def __init__(self):
         self.url = os.getenv("ODOO_URL")
         self.db =  os.getenv("ODOO_DB")
         self.username = os.getenv("ODOO_USER")
         self.password = os.getenv("ODOO_PASS")
+        self.pool_size = int(os.getenv("ODOO_POOL_SIZE", "4"))
+        self.timeout = float(os.getenv("ODOO_TIMEOUT", "60"))
+        self.idle_timeout = float(os.getenv("ODOO_POOL_IDLE_TIMEOUT", "30"))
+        # "xmlrpc" (default) or "jsonrpc"
+        self.protocol = os.getenv("ODOO_PROTOCOL", "xmlrpc")
+        self.metadata_cache_path = os.getenv("ODOO_METADATA_CACHE_PATH", ".odoo_metadata_cache.json")
+        self.metadata_cache_ttl = float(os.getenv("ODOO_METADATA_CACHE_TTL", "86400"))
+        self.async_concurrency = int(os.getenv("ODOO_ASYNC_CONCURRENCY", os.getenv("ODOO_POOL_SIZE", "4")))
+        # Long id lists in read()/search_read() are split into chunks of this
+        # size and read on up to read_parallelism threads
+        self.read_chunk_size = int(os.getenv("ODOO_READ_CHUNK_SIZE", "200"))
+        self.read_parallelism = int(os.getenv("ODOO_READ_PARALLELISM", "4"))
+        # write_date-validated record cache; size 0 disables it
+        self.record_cache_size = int(os.getenv("ODOO_RECORD_CACHE_SIZE", "5000"))
+        self.record_cache_models = os.getenv("ODOO_RECORD_CACHE_MODELS", "product.template,product.product")
+        # Records written less than this many seconds ago are not cached
+        self.record_cache_settle = float(os.getenv("ODOO_RECORD_CACHE_SETTLE", "60"))
+        # Decode large XML-RPC responses incrementally in iter_read/iter_search_read
+        self.stream_responses = os.getenv("ODOO_STREAM_RESPONSES", "0") == "1"
+        # Adaptive (AIMD) in-flight limit between min and max concurrency,
+        # shrinking when calls take longer than latency_target seconds or fail
+        self.min_concurrency = int(os.getenv("ODOO_MIN_CONCURRENCY", "1"))
+        self.max_concurrency = int(os.getenv("ODOO_MAX_CONCURRENCY", os.getenv("ODOO_POOL_SIZE", "4")))
+        self.latency_target = float(os.getenv("ODOO_LATENCY_TARGET", "2"))
+        # Hard cap on calls per second into Odoo; 0 disables it
+        self.max_calls_per_second = float(os.getenv("ODOO_MAX_CALLS_PER_SECOND", "0"))
+        # Total time budget of one logical call, retries included
+        self.call_deadline = float(os.getenv("ODOO_CALL_DEADLINE", "120"))
+        # Retries (idempotent methods only) with jittered exponential backoff
+        self.retries = int(os.getenv("ODOO_RETRIES", "3"))
+        self.retry_backoff = float(os.getenv("ODOO_RETRY_BACKOFF", "0.5"))
+        self.retry_backoff_max = float(os.getenv("ODOO_RETRY_BACKOFF_MAX", "8"))
+        # Consecutive failures before failing fast, and seconds until a probe
+        self.breaker_threshold = int(os.getenv("ODOO_BREAKER_THRESHOLD", "5"))
+        self.breaker_reset = float(os.getenv("ODOO_BREAKER_RESET", "30"))
+        # Ask Odoo for gzip responses; gzip request bodies above this many
+        # bytes (0 = never, a stock Odoo cannot decode them)
+        self.gzip_responses = os.getenv("ODOO_GZIP_RESPONSES", "1") == "1"
+        self.gzip_request_threshold = int(os.getenv("ODOO_GZIP_REQUEST_THRESHOLD", "0"))
         pass
 
 class OdooConnector:
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    # Safe to replay after a timeout or dropped connection
+    IDEMPOTENT_METHODS = {
+        'search', 'read', 'search_read', 'search_count', 'fields_get',
+        'default_get', 'check_access_rights', 'read_group', 'name_get',
+    }
+
     def __init__(self):
-        self.url = odoo_configs().url
-        self.db = odoo_configs().db
-        self.username = odoo_configs().username
-        self.password = odoo_configs().password
-        self.common = xmlrpc.client.ServerProxy('{}/xmlrpc/2/common'.format(self.url))
-        self.uid = self.common.authenticate(self.db, self.username, self.password, {})
-        self.models = xmlrpc.client.ServerProxy('{}/xmlrpc/2/object'.format(self.url))
+        configs = odoo_configs()
+        self.url = configs.url
+        self.db = configs.db
+        self.username = configs.username
+        self.password = configs.password
+        self.protocol = configs.protocol
+        # One keep-alive pool shared by both endpoints, so consecutive
+        # execute_kw calls reuse the same TCP/TLS connection.
+        transport_options = dict(
+            pool_size=configs.pool_size,
+            timeout=configs.timeout,
+            idle_timeout=configs.idle_timeout,
+            accept_gzip=configs.gzip_responses,
+            gzip_request_threshold=configs.gzip_request_threshold or None,
+        )
+        if self.protocol == "jsonrpc":
+            self.transport = JsonRpcTransport.for_url(self.url, **transport_options)
+        elif self.protocol == "xmlrpc":
+            self.transport = PooledTransport.for_url(self.url, **transport_options)
+        else:
+            raise Exception("Unknown ODOO_PROTOCOL %r, expected 'xmlrpc' or 'jsonrpc'" % self.protocol)
+        # ServerProxy is not thread-safe: every thread gets its own proxies
+        # on top of the shared, thread-safe transport.
+        self._local = threading.local()
+        self.read_chunk_size = configs.read_chunk_size
+        self.read_parallelism = configs.read_parallelism
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.metadata_cache = ModelMetadataCache(configs.metadata_cache_path, configs.metadata_cache_ttl)
+        self.record_cache = RecordCache(configs.record_cache_size, configs.record_cache_settle) if configs.record_cache_size > 0 else None
+        self.record_cache_models = {m.strip() for m in configs.record_cache_models.split(",") if m.strip()}
+        self.stream_responses = configs.stream_responses and self.protocol == "xmlrpc"
+        self.stats = RpcStats()
+        self.limiter = AdaptiveLimiter(
+            min_limit=configs.min_concurrency,
+            max_limit=configs.max_concurrency,
+            latency_target=configs.latency_target,
+        )
+        self.rate_limiter = TokenBucket(configs.max_calls_per_second)
+        self.breaker = CircuitBreaker(configs.breaker_threshold, configs.breaker_reset)
+        self.call_deadline = configs.call_deadline
+        self.retries = configs.retries
+        self.retry_backoff = configs.retry_backoff
+        self.retry_backoff_max = configs.retry_backoff_max
+        self._auth_lock = threading.Lock()
+        # Logged in by the first call, under its deadline and the breaker,
+        # so building a connector never blocks on an unreachable Odoo
+        self.uid = None
+
+    def _proxy(self, service):
+        proxies = self._local.__dict__
+        if service not in proxies:
+            if self.protocol == "jsonrpc":
+                proxies[service] = JsonRpcProxy(self.url, service, self.transport)
+            else:
+                proxies[service] = xmlrpc.client.ServerProxy(
+                    '{}/xmlrpc/2/{}'.format(self.url, service), transport=self.transport)
+        return proxies[service]
+
+    @property
+    def common(self):
+        return self._proxy("common")
+
+    @property
+    def models(self):
+        return self._proxy("object")
+
+    @classmethod
+    def shared(cls):
+        """Process-wide connector, logged in on first use.
+
+        Logging in costs a full RPC, so the web handlers and the sync worker
+        reuse one connector (uid + keep-alive transport) instead of building
+        a new one per request or per cycle.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            if cls._shared is not None:
+                cls._shared.close()
+            cls._shared = None
+
+    def authenticate(self, stale_uid=None, deadline=None):
+        """Log in within ``deadline`` seconds, through the circuit breaker"""
+        self.breaker.before_call()
+        try:
+            with self.transport.call_timeout(deadline or self.call_deadline):
+                uid = self._login(stale_uid)
+        except PoolExhausted:
+            self.breaker.abandon()
+            raise
+        except Exception as e:
+            self.breaker.record(e if self._is_transient(e) else None)
+            raise
+        self.breaker.record(None)
+        return uid
+
+    def _login(self, stale_uid=None):
+        with self._auth_lock:
+            # Another thread may already have logged in (again) while we waited
+            if stale_uid is None and self.uid is not None:
+                return self.uid
+            if stale_uid is not None and self.uid not in (None, stale_uid):
+                return self.uid
+            uid = self._instrumented("common", "authenticate", self.common.authenticate,
+                                     self.db, self.username, self.password, {})
+            if not uid:
+                raise Exception("Odoo authentication failed for %s on %s" % (self.username, self.db))
+            self.uid = uid
+            print("[odoo] authenticated as uid %s" % uid)
+            return uid
+
+    @staticmethod
+    def _is_auth_fault(fault):
+        text = str(fault.faultString)
+        return (
+            fault.faultCode == 3
+            or "AccessDenied" in text
+            or "Access Denied" in text
+            or "SessionExpired" in text
+        )
+
+    def _instrumented(self, model, method, call, *args):
+        started = time.monotonic()
+        error = None
+        try:
+            return call(*args)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record_stats(model, method, started, error)
+
+    def _record_stats(self, model, method, started, error):
+        request_bytes, response_bytes = self.transport.last_call_bytes()
+        self.stats.record(
+            model, method, time.monotonic() - started, request_bytes, response_bytes, error,
+            decoded_bytes=sum(self.transport.last_call_decoded_bytes()),
+        )
+
+    def _execute(self, uid, model, method, args, kwargs, deadline_at=None):
+        call_args = (self.db, uid, self.password, model, method, args)
+        if kwargs is not None:
+            call_args += (kwargs,)
+        self.rate_limiter.acquire(deadline_at)
+        with self.limiter.slot(deadline_at):
+            if deadline_at is None:
+                return self._instrumented(model, method, self.models.execute_kw, *call_args)
+            # The socket gets whatever the wait for the slot left over
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise SlotTimeout("%s.%s had no time left after waiting for a call slot" % (model, method))
+            with self.transport.call_timeout(remaining):
+                return self._instrumented(model, method, self.models.execute_kw, *call_args)
+
+    @staticmethod
+    def _is_transient(error):
+        """Transport-level failures worth a retry (and counted by the breaker)"""
+        if isinstance(error, xmlrpc.client.ProtocolError):
+            return error.errcode >= 500 or error.errcode == 429
+        return isinstance(error, (OSError, http.client.HTTPException))
+
+    def execute_kw(self, model, method, args, kwargs=None, deadline=None):
+        """Call ``model.method`` within ``deadline`` seconds.
+
+        Idempotent methods are retried on transient failures with jittered
+        exponential backoff while the deadline allows. The circuit breaker
+        raises OdooUnavailable right away while Odoo is known to be down.
+        """
+        self.breaker.before_call()
+        deadline_at = time.monotonic() + (deadline or self.call_deadline)
+        attempts = 1 + (self.retries if method in self.IDEMPOTENT_METHODS else 0)
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                error = TimeoutError("%s.%s exceeded its %ss deadline" % (model, method, deadline or self.call_deadline))
+                self.breaker.record(error)
+                raise error
+            try:
+                with self.transport.call_timeout(remaining):
+                    result = self._execute_authenticated(model, method, args, kwargs, deadline_at)
+            except (PoolExhausted, SlotTimeout):
+                # Local contention for a connection or a call slot, Odoo was never asked
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not self._is_transient(e):
+                    # Odoo answered (a fault) or the call never left: not a health signal
+                    self.breaker.record(None)
+                    raise
+                self.breaker.record(e)
+                if attempt >= attempts or self.breaker.is_open:
+                    raise
+                delay = random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2 ** (attempt - 1)))
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                print(f"[odoo] {model}.{method} failed ({str(e)}), retry {attempt}/{attempts - 1} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            self.breaker.record(None)
+            return result
+
+    def _execute_authenticated(self, model, method, args, kwargs, deadline_at=None):
+        uid = self.uid or self._login()
+        try:
+            return self._execute(uid, model, method, args, kwargs, deadline_at)
+        except xmlrpc.client.Fault as e:
+            if not self._is_auth_fault(e):
+                raise
+            # Session went stale (password rotated, user re-created, db
+            # restored...): log in again once and replay the call.
+            print("[odoo] session rejected, re-authenticating")
+            uid = self._login(stale_uid=uid)
+            return self._execute(uid, model, method, args, kwargs, deadline_at)
+
+    def iter_execute_kw(self, model, method, args, kwargs=None):
+        """execute_kw for list results, yielding items as they are decoded.
+
+        With ODOO_STREAM_RESPONSES=1 on the XML-RPC backend the response is
+        parsed incrementally, so peak memory follows one record instead of
+        the whole response. Otherwise it falls back to execute_kw(). The
+        recorded latency includes the time the consumer spends per item.
+        """
+        if not self.stream_responses:
+            yield from self.execute_kw(model, method, args, kwargs)
+            return
+
+        uid = self.uid or self.authenticate()
+        self.breaker.before_call()
+        parsed = urlparse(self.url)
+        handler = parsed.path.rstrip('/') + '/xmlrpc/2/object'
+        for attempt in (0, 1):
+            params = (self.db, uid, self.password, model, method, args)
+            if kwargs is not None:
+                params += (kwargs,)
+            body = xmlrpc.client.dumps(params, 'execute_kw', encoding='utf-8').encode('utf-8', 'xmlcharrefreplace')
+            # Streams are rate limited but hold no concurrency slot while the
+            # consumer works through the records
+            self.rate_limiter.acquire()
+            started = time.monotonic()
+            error = None
+            yielded = False
+            try:
+                for item in self.transport.stream_request(parsed.netloc, handler, body):
+                    yielded = True
+                    yield item
+                return
+            except xmlrpc.client.Fault as e:
+                error = e
+                if yielded or attempt or not self._is_auth_fault(e):
+                    raise
+                print("[odoo] session rejected, re-authenticating")
+                with self.transport.call_timeout(self.call_deadline):
+                    uid = self._login(stale_uid=uid)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self.breaker.record(error if self._is_transient(error) else None)
+                self._record_stats(model, method, started, error)
+
+    def iter_read(self, model, ids, fields):
+        """Streaming read(); falls back to the chunked read when streaming is off"""
+        if not self.stream_responses:
+            yield from self.read(model, ids, fields)
+            return
+        yield from self.iter_execute_kw(model, 'read', [ids], {'fields': fields})
+
+    def iter_search_read(self, model, domain, fields, offset=0, limit=0, order=None):
+        """Streaming search_read()"""
+        if not self.stream_responses:
+            yield from self.search_read(model, domain, fields, offset=offset, limit=limit, order=order)
+            return
+        kwargs = {'fields': fields, 'offset': offset, 'limit': limit}
+        if order:
+            kwargs['order'] = order
+        yield from self.iter_execute_kw(model, 'search_read', [domain], kwargs)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.transport.close()
+
+    def _chunks(self, ids, chunk_size=None):
+        chunk_size = chunk_size or self.read_chunk_size
+        return [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    def _map_chunks(self, fn, chunks):
+        """Run ``fn`` over chunks on the read thread pool, results in chunk order"""
+        if len(chunks) <= 1 or self.read_parallelism <= 1:
+            return [fn(chunk) for chunk in chunks]
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.read_parallelism, thread_name_prefix="odoo-read")
+        return list(self._executor.map(fn, chunks))
 
     def search(self, model, domain, offset=0, limit=0):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'search', [domain], {'offset': offset, 'limit': limit})
+        return self.execute_kw(model, 'search', [domain], {'offset': offset, 'limit': limit})
+
+    def _uses_record_cache(self, model, fields):
+        return (
+            self.record_cache is not None
+            and model in self.record_cache_models
+            and RecordCache.cacheable(fields, self.stored_fields(model))
+        )
+
+    def _prime_record_cache(self, model, records):
+        if self.record_cache is not None and model in self.record_cache_models and records:
+            stored = self.stored_fields(model)
+            for record in records:
+                self.record_cache.put(model, record, stored)
+        return records
+
+    def read(self, model, ids, fields, chunk_size=None, write_dates=None):
+        """Read records; long id lists are split into chunks read in parallel.
+
+        For cached models, records whose ``write_date`` the caller already
+        has (``write_dates``, {id: write_date}) are served from the record
+        cache while unchanged. Other ids are read from Odoo, which costs the
+        same single RPC as without the cache and primes it.
+        """
+        if isinstance(ids, (list, tuple)) and self._uses_record_cache(model, fields):
+            return self._cached_read(model, list(ids), list(fields), chunk_size, write_dates)
+        return self._read(model, ids, fields, chunk_size)
+
+    def _cached_read(self, model, ids, fields, chunk_size, write_dates):
+        write_dates = write_dates or {}
+        found = {}
+        missing = []
+        for record_id in ids:
+            # No write_date probe: checking it would cost a round trip of its own
+            record = None
+            if record_id in write_dates:
+                record = self.record_cache.get(model, record_id, fields, write_dates[record_id])
+            if record is None:
+                missing.append(record_id)
+            else:
+                found[record_id] = record
 
-    def read(self, model, ids, fields):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'read', [ids], {'fields': fields})
+        if missing:
+            read_fields = fields if 'write_date' in fields else fields + ['write_date']
+            for record in self._prime_record_cache(model, self._read(model, missing, read_fields, chunk_size)):
+                found[record['id']] = {f: v for f, v in record.items() if f == 'id' or f in fields}
+        return [found[i] for i in ids if i in found]
+
+    def _read(self, model, ids, fields, chunk_size=None):
+        if not isinstance(ids, (list, tuple)) or len(ids) <= (chunk_size or self.read_chunk_size):
+            return self.execute_kw(model, 'read', [ids], {'fields': fields})
+        pages = self._map_chunks(
+            lambda chunk: self.execute_kw(model, 'read', [chunk], {'fields': fields}),
+            self._chunks(list(ids), chunk_size),
+        )
+        return [record for page in pages for record in page]
 
     def write(self, model, ids, values):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'write', [ids, values])
+        if self.record_cache is not None:
+            self.record_cache.invalidate(model, ids if isinstance(ids, (list, tuple)) else [ids])
+        return self.execute_kw(model, 'write', [ids, values])
 
     def create(self, model, values):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'create', [values])
+        return self.execute_kw(model, 'create', [values])
 
     def unlink(self, model, ids):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'unlink', [ids])
+        if self.record_cache is not None:
+            self.record_cache.invalidate(model, ids if isinstance(ids, (list, tuple)) else [ids])
+        return self.execute_kw(model, 'unlink', [ids])
+
+    def fields_get(self, model, attributes, use_cache=True):
+        """``fields_get`` served from the metadata cache when possible"""
+        key = ModelMetadataCache.key(self.url, self.db, model, attributes)
+        if use_cache:
+            cached = self.metadata_cache.get(key)
+            if cached is not None:
+                return cached
+        fields = self.execute_kw(model, 'fields_get', [], {'attributes': attributes})
+        return self.metadata_cache.set(key, fields)
+
+    def stored_fields(self, model):
+        """Names of the fields Odoo stores in the database for ``model``"""
+        return {name for name, attrs in self.fields_get(model, ['store']).items() if attrs.get('store')}
 
-    def get_model_fields(self, model):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'fields_get', [], {'attributes': ['string']})
+    def get_model_fields(self, model, use_cache=True):
+        return self.fields_get(model, ['string'], use_cache=use_cache)
 
-    def search_read(self, model, domain, fields, offset=0, limit=0):
+    def search_read(self, model, domain, fields, offset=0, limit=0, order=None, chunk_size=None):
         """Search and read records in one call"""
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'search_read', [domain], {
+        chunk_size = chunk_size or self.read_chunk_size
+        id_leaf = self._id_in_leaf(domain)
+        if id_leaf is not None and not (offset or limit or order) and len(domain[id_leaf][2]) > chunk_size:
+            # A huge ('id', 'in', [...]) leaf: split it and merge the chunks
+            # back in the order the ids were given
+            ids = list(domain[id_leaf][2])
+
+            def read_chunk(chunk):
+                chunk_domain = list(domain)
+                chunk_domain[id_leaf] = ('id', 'in', chunk)
+                return self.execute_kw(model, 'search_read', [chunk_domain], {'fields': fields})
+
+            pages = self._map_chunks(read_chunk, self._chunks(ids, chunk_size))
+            position = {record_id: i for i, record_id in reversed(list(enumerate(ids)))}
+            records = [record for page in pages for record in page]
+            records.sort(key=lambda record: position.get(record['id'], len(ids)))
+            return self._prime_record_cache(model, records)
+
+        kwargs = {
             'fields': fields,
             'offset': offset,
             'limit': limit
-        })
+        }
+        if order:
+            kwargs['order'] = order
+        return self._prime_record_cache(model, self.execute_kw(model, 'search_read', [domain], kwargs))
+
+    def get_binary_manifest(self, model, ids, fields):
+        """Checksum and size of attachment-stored binary fields, without their content.
+
+        Returns ``{res_id: {field: {"checksum": ..., "file_size": ...}}}``;
+        a field missing from a record's dict is empty in Odoo.
+        """
+        manifest = {record_id: {} for record_id in ids}
+        if not ids:
+            return manifest
+        # Naming res_field in the domain is what makes Odoo return field
+        # attachments at all (they are hidden from plain searches)
+        attachments = self.search_read(
+            'ir.attachment',
+            [('res_model', '=', model), ('res_field', 'in', list(fields)), ('res_id', 'in', list(ids))],
+            ['res_id', 'res_field', 'checksum', 'file_size'],
+        )
+        for attachment in attachments:
+            manifest.setdefault(attachment['res_id'], {})[attachment['res_field']] = {
+                'checksum': attachment['checksum'],
+                'file_size': attachment['file_size'],
+            }
+        return manifest
+
+    @staticmethod
+    def _id_in_leaf(domain):
+        """Index of the one ('id', 'in', [...]) leaf of a domain that may be
+        split into chunks, or None.
+
+        Only a plain AND of leaves qualifies: under '|' or '!' a chunk would
+        not narrow the result, so every chunk could return the same records.
+        """
+        if any(term in ('|', '!') for term in domain or []):
+            return None
+        leaves = [i for i, leaf in enumerate(domain or [])
+                  if isinstance(leaf, (list, tuple)) and len(leaf) == 3
+                  and leaf[0] == 'id' and leaf[1] == 'in' and isinstance(leaf[2], (list, tuple))]
+        return leaves[0] if len(leaves) == 1 else None
 
     def get_model_domain(self, model):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'fields_get', [], {'attributes': ['domain']})
+        return self.fields_get(model, ['domain'])
 
     def get_model_constraints(self, model):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'fields_get', [], {'attributes': ['constraints']})
+        return self.fields_get(model, ['constraints'])
 
     def get_model_defaults(self, model):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'default_get', [])
+        return self.execute_kw(model, 'default_get', [])
 
     def get_model_access(self, model):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'check_access_rights', ['write', False])
+        return self.execute_kw(model, 'check_access_rights', ['write', False])
 
     def get_model_access_create(self, model):
-        return self.models.execute_kw(self.db, self.uid, self.password, model, 'check_access_rights', ['create', False])
+        return self.execute_kw(model, 'check_access_rights', ['create', False])
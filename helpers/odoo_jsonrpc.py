@@ -0,0 +1,80 @@
+import gzip
+import itertools
+import json
+import xmlrpc.client
+from urllib.parse import urlparse
+
+from helpers.odoo_transport import PooledTransport
+
+
+class JsonRpcTransport(PooledTransport):
+    """Keep-alive transport speaking Odoo's ``/jsonrpc`` dialect.
+
+    Reuses the connection pool of PooledTransport and only swaps the wire
+    format: JSON bodies in, JSON bodies out. Odoo errors are raised as
+    ``xmlrpc.client.Fault`` so callers handle both backends the same way.
+    """
+
+    def send_request(self, host, handler, request_body, debug):
+        connection = self.make_connection(host)
+        headers = self._headers + self._extra_headers
+        if debug:
+            connection.set_debuglevel(1)
+        if self.accept_gzip_encoding:
+            connection.putrequest("POST", handler, skip_accept_encoding=True)
+            headers.append(("Accept-Encoding", "gzip"))
+        else:
+            connection.putrequest("POST", handler)
+        headers.append(("Content-Type", "application/json"))
+        headers.append(("User-Agent", self.user_agent))
+        self.send_headers(connection, headers)
+        self.send_content(connection, request_body)
+        return connection
+
+    def parse_response(self, response):
+        body = response.read()
+        if response.getheader("Content-Encoding", "") == "gzip":
+            body = gzip.decompress(body)
+        self._local.response_decoded_bytes = len(body)
+        if self.verbose:
+            print("body:", repr(body))
+        payload = json.loads(body)
+        error = payload.get("error")
+        if error:
+            data = error.get("data") or {}
+            raise xmlrpc.client.Fault(
+                error.get("code", 1),
+                "%s: %s" % (data.get("name", error.get("message")), data.get("message", error.get("message"))),
+            )
+        return payload.get("result")
+
+
+class JsonRpcProxy:
+    """Drop-in for ``xmlrpc.client.ServerProxy`` on one Odoo service.
+
+    ``JsonRpcProxy(url, "object", transport).execute_kw(...)`` sends the same
+    positional arguments the XML-RPC endpoint expects.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, service, transport):
+        parsed = urlparse(url)
+        self._host = parsed.netloc
+        self._handler = parsed.path.rstrip("/") + "/jsonrpc"
+        self._service = service
+        self._transport = transport
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return lambda *args: self._call(method, args)
+
+    def _call(self, method, args):
+        body = json.dumps({
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": self._service, "method": method, "args": list(args)},
+            "id": next(self._ids),
+        }).encode("utf-8")
+        return self._transport.request(self._host, self._handler, body)
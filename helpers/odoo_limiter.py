@@ -0,0 +1,180 @@
+import threading
+import time
+import xmlrpc.client
+from contextlib import contextmanager
+
+
+class SlotTimeout(TimeoutError):
+    """The call's deadline ran out waiting in a limiter; nothing was sent to Odoo"""
+
+
+class AdaptiveLimiter:
+    """AIMD cap on in-flight Odoo calls.
+
+    The Odoo instance also serves back-office users, so the worker backs off
+    when Odoo struggles: every call slower than ``latency_target`` seconds or
+    failing with a transport/server error halves the limit (at most once per
+    ``cooldown`` seconds), and each success adds ``1/limit`` so the limit
+    grows by one per round of successful calls.
+    """
+
+    def __init__(self, min_limit=1, max_limit=4, initial=None, latency_target=2.0, cooldown=1.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(initial or self.max_limit)
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def is_overload(error):
+        # Business faults (validation, access...) say nothing about load
+        return error is not None and not isinstance(error, xmlrpc.client.Fault)
+
+    def acquire(self, deadline_at=None):
+        """Take a slot, waiting at most until ``deadline_at`` (monotonic)"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                if deadline_at is None:
+                    self._condition.wait()
+                    continue
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise SlotTimeout("no Odoo call slot free before the deadline (%d in flight)" % self.in_flight)
+                self._condition.wait(remaining)
+            self.in_flight += 1
+
+    def release(self, latency, error=None):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if self.is_overload(error) or latency > self.latency_target:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, deadline_at=None):
+        self.acquire(deadline_at)
+        started = time.monotonic()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(time.monotonic() - started, error)
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "decreases": self.decreases,
+            }
+
+
+class TokenBucket:
+    """Caps calls per second; ``rate`` 0 disables it."""
+
+    def __init__(self, rate=0, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline_at=None):
+        """Take a token, sleeping at most until ``deadline_at`` (monotonic)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            if deadline_at is not None and now + wait > deadline_at:
+                raise SlotTimeout("Odoo rate limit leaves no call before the deadline")
+            time.sleep(wait)
+
+
+class OdooUnavailable(Exception):
+    """Raised without calling Odoo while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fails Odoo calls fast after repeated transport failures.
+
+    ``failure_threshold`` consecutive failures open the circuit; for the next
+    ``reset_timeout`` seconds calls raise OdooUnavailable immediately instead
+    of piling up behind a dead server. After that a single half-open probe is
+    let through: success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise OdooUnavailable("Odoo is unavailable (circuit open, next probe in %.0fs)" % remaining)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise OdooUnavailable("Odoo is unavailable (circuit half-open, probe in progress)")
+                self._probe_in_flight = True
+
+    def record(self, error=None):
+        with self._lock:
+            if error is None:
+                if self.state != self.CLOSED:
+                    print("[odoo.breaker] Odoo answered again, circuit closed")
+                self.state = self.CLOSED
+                self.failures = 0
+                self._probe_in_flight = False
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print("[odoo.breaker] circuit opened after %d failures: %s" % (self.failures, str(error)))
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def abandon(self):
+        """The call never reached Odoo: free a half-open probe, count nothing"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
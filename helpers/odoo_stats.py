@@ -0,0 +1,102 @@
+import threading
+import time
+
+
+class RpcStats:
+    """Per (model, method) latency histogram, call/error counts and bytes.
+
+    OdooConnector records every execute_kw here. ``snapshot()`` returns the
+    raw numbers and ``report()`` a table sorted by total time, so the
+    expensive calls of a sync cycle stand out.
+    """
+
+    # Upper bounds of the latency buckets, in milliseconds
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.started_at = time.time()
+
+    def _entry(self, key):
+        entry = self._calls.get(key)
+        if entry is None:
+            entry = self._calls[key] = {
+                "calls": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "request_bytes": 0,
+                "response_bytes": 0,
+                "decoded_bytes": 0,
+                "histogram": [0] * len(self.BUCKETS_MS),
+            }
+        return entry
+
+    def record(self, model, method, seconds, request_bytes=0, response_bytes=0, error=None, decoded_bytes=None):
+        """``request_bytes``/``response_bytes`` are wire sizes; ``decoded_bytes``
+        is what both bodies amount to uncompressed (defaults to the wire size)"""
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            entry = self._entry((model, method))
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["request_bytes"] += request_bytes
+            entry["response_bytes"] += response_bytes
+            entry["decoded_bytes"] += request_bytes + response_bytes if decoded_bytes is None else decoded_bytes
+            if error is not None:
+                entry["errors"] += 1
+            for i, bound in enumerate(self.BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    entry["histogram"][i] += 1
+                    break
+
+    @classmethod
+    def percentile(cls, histogram, fraction):
+        """Upper bucket bound below which ``fraction`` of the calls fall"""
+        total = sum(histogram)
+        if total == 0:
+            return 0
+        seen = 0
+        for bound, count in zip(cls.BUCKETS_MS, histogram):
+            seen += count
+            if seen >= total * fraction:
+                return bound
+        return cls.BUCKETS_MS[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "%s.%s" % key: dict(entry, histogram=list(entry["histogram"]))
+                for key, entry in self._calls.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}
+            self.started_at = time.time()
+
+    def report(self):
+        rows = sorted(self.snapshot().items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        wire = sum(entry["request_bytes"] + entry["response_bytes"] for _, entry in rows)
+        decoded = sum(entry["decoded_bytes"] for _, entry in rows)
+        lines = [
+            "[odoo.stats] %d call types over %.1fs, %d bytes on the wire for %d decoded (%.0f%% saved by gzip)" % (
+                len(rows), time.time() - self.started_at, wire, decoded, 100 - 100.0 * wire / decoded if decoded else 0),
+            "  %-45s %6s %5s %10s %9s %9s %9s %11s %11s" % (
+                "model.method", "calls", "errs", "total ms", "avg ms", "p95 ms", "max ms", "req bytes", "resp bytes"),
+        ]
+        for name, entry in rows:
+            lines.append("  %-45s %6d %5d %10.1f %9.1f %9s %9.1f %11d %11d" % (
+                name,
+                entry["calls"],
+                entry["errors"],
+                entry["total_ms"],
+                entry["total_ms"] / entry["calls"],
+                "%g" % self.percentile(entry["histogram"], 0.95),
+                entry["max_ms"],
+                entry["request_bytes"],
+                entry["response_bytes"],
+            ))
+        return "\n".join(lines)
@@ -0,0 +1,329 @@
+import http.client
+import threading
+import time
+import xmlrpc.client
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class PoolExhausted(Exception):
+    """No pooled connection came free in time; nothing was sent to Odoo"""
+
+
+class CountingResponse:
+    """Wraps an HTTPResponse and counts the body bytes read from the wire"""
+
+    def __init__(self, response):
+        self.response = response
+        self.bytes_read = 0
+
+    def read(self, *args):
+        data = self.response.read(*args)
+        self.bytes_read += len(data)
+        return data
+
+    def getheader(self, name, default=None):
+        return self.response.getheader(name, default)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class CountingParser:
+    """Wraps an XML-RPC parser and counts the decoded bytes fed to it"""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.bytes_fed = 0
+
+    def feed(self, data):
+        self.bytes_fed += len(data)
+        self.parser.feed(data)
+
+    def close(self):
+        self.parser.close()
+
+
+class StreamingUnmarshaller(xmlrpc.client.Unmarshaller):
+    """Unmarshaller that releases items of a top-level array as they complete.
+
+    The stock Unmarshaller only returns once the whole response is decoded.
+    Here every finished element of the response array (a record, for
+    ``read``/``search_read``) is moved to ``ready`` and dropped from the
+    parse stack, so memory holds one record rather than the full result.
+    """
+
+    def __init__(self, use_datetime=False, use_builtin_types=False):
+        super().__init__(use_datetime=use_datetime, use_builtin_types=use_builtin_types)
+        self.ready = deque()
+        self._top = None
+
+    def start(self, tag, attrs):
+        if self._top is None and tag in ("array", "struct"):
+            self._top = tag
+        super().start(tag, attrs)
+
+    def end(self, tag):
+        result = super().end(tag)
+        if tag == "value" and self._top == "array" and len(self._marks) == 1:
+            self.ready.append(self._stack.pop())
+        return result
+
+
+class PooledTransport(xmlrpc.client.Transport):
+    """XML-RPC transport that keeps HTTP/1.1 connections alive between calls.
+
+    The stock Transport caches a single connection and is not safe to share
+    between threads, so every ServerProxy ends up paying a TCP (and TLS)
+    handshake on most calls. This one keeps up to ``pool_size`` idle
+    connections per host, hands them out one caller at a time and drops
+    connections that sat idle longer than ``idle_timeout`` seconds.
+
+    Responses are requested gzip-compressed unless ``accept_gzip`` is off,
+    and request bodies larger than ``gzip_request_threshold`` bytes are
+    compressed too (None leaves requests uncompressed, which is the only
+    thing a stock Odoo understands).
+    """
+
+    def __init__(self, use_https=False, pool_size=4, timeout=60, idle_timeout=30,
+                 context=None, use_datetime=False, use_builtin_types=False, headers=(),
+                 accept_gzip=True, gzip_request_threshold=None):
+        super().__init__(use_datetime=use_datetime, use_builtin_types=use_builtin_types, headers=headers)
+        self.accept_gzip_encoding = accept_gzip
+        self.encode_threshold = gzip_request_threshold
+        self.use_https = use_https
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.context = context
+        self._idle = deque()  # (host, connection, last_used)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._local = threading.local()
+
+    @classmethod
+    def for_url(cls, url, **kwargs):
+        return cls(use_https=urlparse(url).scheme == "https", **kwargs)
+
+    def _new_connection(self, host):
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        if self.use_https:
+            return http.client.HTTPSConnection(chost, timeout=self.timeout, context=self.context, **(x509 or {}))
+        return http.client.HTTPConnection(chost, timeout=self.timeout)
+
+    def _borrow(self, host):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                idle_host, conn, last_used = self._idle.pop()
+                if idle_host == host and now - last_used < self.idle_timeout:
+                    return conn, True
+                conn.close()
+        return self._new_connection(host), False
+
+    def _release(self, host, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((host, conn, time.monotonic()))
+                return
+        conn.close()
+
+    @contextmanager
+    def call_timeout(self, seconds):
+        """Bound socket operations of this thread's calls to ``seconds``"""
+        previous = getattr(self._local, "timeout", None)
+        self._local.timeout = seconds
+        try:
+            yield
+        finally:
+            self._local.timeout = previous
+
+    def _current_timeout(self):
+        timeout = getattr(self._local, "timeout", None)
+        if timeout is None:
+            return self.timeout
+        return min(timeout, self.timeout) if self.timeout else timeout
+
+    def _apply_timeout(self, conn):
+        timeout = self._current_timeout()
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+    def make_connection(self, host):
+        # send_request() asks for a connection; hand back the one borrowed
+        # for this thread's in-flight call instead of the shared cached one.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return super().make_connection(host)
+        return conn
+
+    def send_content(self, connection, request_body):
+        # Transport.send_content, remembering the size that went on the wire
+        if self.encode_threshold is not None and self.encode_threshold < len(request_body):
+            connection.putheader("Content-Encoding", "gzip")
+            request_body = xmlrpc.client.gzip_encode(request_body)
+        self._local.request_bytes = len(request_body)
+        connection.putheader("Content-Length", str(len(request_body)))
+        connection.endheaders(request_body)
+
+    def getparser(self):
+        parser, unmarshaller = super().getparser()
+        self._local.parser = CountingParser(parser)
+        return self._local.parser, unmarshaller
+
+    def parse_response(self, response):
+        self._local.parser = None
+        try:
+            return super().parse_response(response)
+        finally:
+            if self._local.parser is not None:
+                self._local.response_decoded_bytes = self._local.parser.bytes_fed
+            self._local.parser = None
+
+    def _reset_call_bytes(self, request_body):
+        # Sizes of this thread's last call, picked up by OdooConnector stats:
+        # what crossed the wire and what it decodes to
+        self._local.request_bytes = len(request_body)
+        self._local.response_bytes = 0
+        self._local.request_decoded_bytes = len(request_body)
+        self._local.response_decoded_bytes = 0
+
+    def request(self, host, handler, request_body, verbose=False):
+        self._reset_call_bytes(request_body)
+        if not self._slots.acquire(timeout=self._current_timeout()):
+            raise PoolExhausted("no free Odoo connection within %ss" % self._current_timeout())
+        try:
+            for attempt in (0, 1):
+                conn, reused = self._borrow(host)
+                self._apply_timeout(conn)
+                self._local.conn = conn
+                try:
+                    self.send_request(host, handler, request_body, verbose)
+                    resp = conn.getresponse()
+                    if resp.status != 200:
+                        if resp.getheader("content-length", ""):
+                            resp.read()
+                        conn.close()
+                        raise xmlrpc.client.ProtocolError(
+                            host + handler, resp.status, resp.reason, dict(resp.getheaders()))
+                    self.verbose = verbose
+                    counted = CountingResponse(resp)
+                    try:
+                        result = self.parse_response(counted)
+                    except xmlrpc.client.Fault:
+                        # The fault body was read completely, the socket is still usable
+                        self._local.response_bytes = counted.bytes_read
+                        self._keep_or_close(host, conn, resp)
+                        raise
+                    self._local.response_bytes = counted.bytes_read
+                    self._keep_or_close(host, conn, resp)
+                    return result
+                except (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                        ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+                    conn.close()
+                    # A kept-alive socket may have been closed by the server
+                    # while idle; retry once on a fresh connection.
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except xmlrpc.client.Fault:
+                    raise
+                except Exception:
+                    conn.close()
+                    raise
+                finally:
+                    self._local.conn = None
+        finally:
+            self._slots.release()
+
+    def stream_request(self, host, handler, request_body, chunk_size=65536):
+        """Like request() for an array response, yielding items while decoding.
+
+        The connection stays borrowed until the generator is exhausted, and
+        is closed rather than reused if the caller stops early. Streamed
+        calls do not hold a pool slot, so a consumer may issue other calls
+        between items without deadlocking a small pool.
+        """
+        self._reset_call_bytes(request_body)
+        for attempt in (0, 1):
+            conn, reused = self._borrow(host)
+            self._apply_timeout(conn)
+            self._local.conn = conn
+            try:
+                self.send_request(host, handler, request_body, False)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                    ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            finally:
+                self._local.conn = None
+
+        if resp.status != 200:
+            if resp.getheader("content-length", ""):
+                resp.read()
+            conn.close()
+            raise xmlrpc.client.ProtocolError(host + handler, resp.status, resp.reason, dict(resp.getheaders()))
+
+        decoder = None
+        if resp.getheader("Content-Encoding", "") == "gzip":
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        unmarshaller = StreamingUnmarshaller(self._use_datetime, self._use_builtin_types)
+        parser = xmlrpc.client.ExpatParser(unmarshaller)
+        received = 0
+        decoded = 0
+        finished = False
+        try:
+            while True:
+                data = resp.read(chunk_size)
+                if not data:
+                    break
+                received += len(data)
+                if decoder:
+                    data = decoder.decompress(data)
+                decoded += len(data)
+                parser.feed(data)
+                while unmarshaller.ready:
+                    yield unmarshaller.ready.popleft()
+            parser.close()
+            finished = True
+            # Raises the Fault if Odoo answered with one
+            unmarshaller.close()
+            while unmarshaller.ready:
+                yield unmarshaller.ready.popleft()
+        finally:
+            self._local.response_bytes = received
+            self._local.response_decoded_bytes = decoded
+            if finished:
+                self._keep_or_close(host, conn, resp)
+            else:
+                conn.close()
+
+    def last_call_bytes(self):
+        """(request bytes, response bytes) of the calling thread's last request"""
+        return getattr(self._local, "request_bytes", 0), getattr(self._local, "response_bytes", 0)
+
+    def last_call_decoded_bytes(self):
+        """Uncompressed (request, response) sizes of the calling thread's last request"""
+        return getattr(self._local, "request_decoded_bytes", 0), getattr(self._local, "response_decoded_bytes", 0)
+
+    def _keep_or_close(self, host, conn, resp):
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(host, conn)
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[1].close()
+        super().close()
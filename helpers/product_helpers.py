@@ -8,56 +8,165 @@ from helpers.odoo_connector import OdooConnector
 from helpers.sql_connector import SQLConnector
 
 
+class ProductPrefetch:
+    """Related Odoo records for one page of product templates.
+
+    Built by ``ProductHelper.prefetch_page``: variants, their attribute values
+    and the templates' taxes are each fetched once for the whole page, then
+    looked up per template here without further RPCs.
+    """
+
+    def __init__(self, variants, attribute_values, taxes):
+        self.variants = variants
+        self.attribute_values = {a["id"]: a for a in attribute_values}
+        self.taxes = taxes
+        self._variants_by_template = {}
+        for v in variants:
+            self._variants_by_template.setdefault(v["product_tmpl_id"][0], []).append(v)
+
+    def variants_of(self, template_id):
+        return self._variants_by_template.get(template_id, [])
+
+    def attributes_of(self, variants):
+        """Attribute values used by ``variants``, without duplicates"""
+        attrs = {}
+        for v in variants:
+            for value_id in v["product_template_variant_value_ids"]:
+                if value_id in self.attribute_values:
+                    attrs[value_id] = self.attribute_values[value_id]
+        return list(attrs.values())
+
+    def taxes_of(self, template):
+        return [self.taxes[tax_id] for tax_id in template.get("taxes_id") or [] if tax_id in self.taxes]
+
+
 class ProductHelper:
 
     connector: OdooConnector
     sql_connector: SQLConnector
 
+    TEMPLATE_IMAGE_FIELDS = ["image_1920", "image_1024", "image_512"]
+    GALLERY_IMAGE_FIELDS = ["image_%d" % i for i in range(1, 11)]
+
+    TAX_FIELDS = ["name", "amount", "amount_type"]
+    ATTRIBUTE_VALUE_FIELDS = ["id", "html_color", "name", "attribute_line_id"]
+
     def __init__(self, connector: OdooConnector, sql_connector: SQLConnector):
         self.connector = connector
         self.sql_connector = sql_connector
+        # account.tax is a handful of rows; read each tax once per helper
+        self._taxes = {}
+        # CatalogIndex of the current sync cycle, kept up to date with what
+        # this helper writes when the runner sets one
+        self.catalog = None
         
-    def get_product_tax_info(self, product_template_id):
+    def get_product_tax_info(self, product_template_id, write_date=None):
         """Get tax information for a product template"""
         try:
-            # Get product template with tax info
+            # Get product template with tax info (served from the record
+            # cache when the template's write_date is already known)
             product_data = self.connector.read(
                 "product.template", 
                 [product_template_id], 
-                ["taxes_id", "list_price"]
+                ["taxes_id", "list_price"],
+                write_dates={product_template_id: write_date} if write_date else None,
             )
             
             if not product_data:
                 return {"has_tax": False, "tax_rate": 0, "tax_amount": 0}
             
             product = product_data[0]
-            tax_info = {"has_tax": False, "tax_rate": 0, "tax_amount": 0}
-            
-            # Get tax details if taxes exist
-            if product.get("taxes_id"):
-                tax_ids = product["taxes_id"]
-                taxes = self.connector.read("account.tax", tax_ids, ["name", "amount", "amount_type"])
-                
-                total_tax_rate = 0
-                for tax in taxes:
-                    if tax["amount_type"] == "percent":
-                        total_tax_rate += tax["amount"]
-                
-                if total_tax_rate > 0:
-                    tax_info["has_tax"] = True
-                    tax_info["tax_rate"] = total_tax_rate
-                    
-                    # Calculate tax amount (assuming price is tax-inclusive)
-                    price_with_tax = product["list_price"]
-                    price_without_tax = price_with_tax / (1 + (total_tax_rate / 100))
-                    tax_info["tax_amount"] = price_with_tax - price_without_tax
-            
-            return tax_info
+            taxes = self.get_taxes(product.get("taxes_id") or [])
+            return self.tax_info(product["list_price"], [taxes[i] for i in product.get("taxes_id") or [] if i in taxes])
             
         except Exception as e:
             print(f"Error getting tax info for product {product_template_id}: {str(e)}")
             return {"has_tax": False, "tax_rate": 0, "tax_amount": 0}
 
+    @staticmethod
+    def tax_info(price_with_tax, taxes):
+        """Tax rate and amount of a tax-inclusive price"""
+        tax_info = {"has_tax": False, "tax_rate": 0, "tax_amount": 0}
+        
+        total_tax_rate = 0
+        for tax in taxes:
+            if tax["amount_type"] == "percent":
+                total_tax_rate += tax["amount"]
+        
+        if total_tax_rate > 0:
+            tax_info["has_tax"] = True
+            tax_info["tax_rate"] = total_tax_rate
+            
+            # Calculate tax amount (assuming price is tax-inclusive)
+            price_without_tax = price_with_tax / (1 + (total_tax_rate / 100))
+            tax_info["tax_amount"] = price_with_tax - price_without_tax
+        
+        return tax_info
+
+    def get_taxes(self, tax_ids):
+        """account.tax records by id, reading only the ones not seen yet"""
+        missing = [i for i in set(tax_ids) if i not in self._taxes]
+        if missing:
+            for tax in self.connector.read("account.tax", missing, self.TAX_FIELDS):
+                self._taxes[tax["id"]] = tax
+        return {i: self._taxes[i] for i in tax_ids if i in self._taxes}
+
+    def prefetch_page(self, templates, variant_fields):
+        """Fetch everything a page of templates refers to, once per model.
+
+        Variants, attribute values and taxes are collected over the whole
+        page and deduplicated, so a page costs the same few RPCs whatever
+        its size instead of a couple of calls per template.
+        """
+        template_ids = [t["id"] for t in templates]
+        # One search_read for all of them: the page bounds the result, and
+        # variants created together share a write_date, so there is nothing
+        # to gain from paging on it
+        variants = self.connector.search_read(
+            "product.product",
+            [("product_tmpl_id", "in", template_ids)],
+            variant_fields,
+            order="id",
+        )
+        
+        value_ids = sorted({i for v in variants for i in v["product_template_variant_value_ids"]})
+        attribute_values = []
+        if value_ids:
+            attribute_values = self.connector.read(
+                "product.template.attribute.value", value_ids, self.ATTRIBUTE_VALUE_FIELDS)
+        
+        taxes = self.get_taxes([i for t in templates for i in t.get("taxes_id") or []])
+        return ProductPrefetch(variants, attribute_values, taxes)
+
+    def apply_image_manifest(self, templates, fields, variants=None):
+        """Fill image fields from ir.attachment metadata instead of base64 blobs.
+
+        Each requested image field is set to its attachment checksum, or False
+        when Odoo has no image, so the existing truthiness checks keep working
+        without transferring image bytes. Variants get ``image_1920`` from
+        their own variant image or, like in Odoo, from their template's.
+        """
+        template_ids = [t["id"] for t in templates]
+        manifest = self.connector.get_binary_manifest("product.template", template_ids, fields)
+        for t in templates:
+            entry = manifest.get(t["id"], {})
+            for field in fields:
+                t[field] = entry[field]["checksum"] if field in entry else False
+
+        if variants:
+            variant_manifest = self.connector.get_binary_manifest(
+                "product.product", [v["id"] for v in variants], ["image_variant_1920"])
+            for v in variants:
+                own = variant_manifest.get(v["id"], {}).get("image_variant_1920")
+                template = manifest.get(v["product_tmpl_id"][0], {}).get("image_1920")
+                v["image_1920"] = (own or template or {}).get("checksum", False)
+        return manifest
+
+    @staticmethod
+    def image_signature(record, fields):
+        """Comparable fingerprint of a record's image checksums"""
+        return tuple(record.get(field) or "" for field in fields)
+
     def get_odoo_image_url(self, product_id, image_type='main'):
         """Generate Odoo public image URL - with correct naming convention"""
         try:
@@ -78,74 +187,72 @@ class ProductHelper:
             print(f"❌ Failed to generate image URL for product {product_id}: {str(e)}")
             return "no_product_image.jpg"
 
-    def sync_product_gallery(self, product_template_id, laravel_product_id):
-        """Sync product gallery URLs from Odoo to Laravel - Fixed with correct image naming"""
+    def gallery_fields(self, template):
+        """Gallery image fields (image_1..image_10) that hold an image.
+
+        ``template`` is a record that went through apply_image_manifest with
+        the gallery fields, so no image bytes are involved.
+        """
+        return [field for field in self.GALLERY_IMAGE_FIELDS if template.get(field)]
+
+    def gallery_rows(self, product_template_id, laravel_product_id, image_fields):
+        """product_galleries rows for the Odoo gallery images in ``image_fields``"""
+        # Gallery images use image_1, image_2, etc. (NOT image_1920);
+        # created_at/updated_at are added by the insert from NOW()
+        return [
+            {
+                "product_id": laravel_product_id,
+                "image": f"https://odoo.eboutiques.com/public/product_image/{product_template_id}/{field}",
+                "status": 1,
+            }
+            for field in image_fields
+        ]
+
+    def sync_product_gallery(self, product_template_id, laravel_product_id, template=None):
+        """Sync product gallery URLs from Odoo to Laravel - Fixed with correct image naming
+        
+        ``template`` is the Odoo template with gallery fields from
+        apply_image_manifest; without it the manifest is read here.
+        """
         try:
             print(f"🖼️  Syncing gallery for product {product_template_id}")
+            if template is None:
+                template = {"id": product_template_id}
+                self.apply_image_manifest([template], self.GALLERY_IMAGE_FIELDS)
+            image_fields = self.gallery_fields(template)
             
-            # Clear existing gallery for this product (from sync)
-            self.sql_connector.delete(
-                "product_galleries", 
-                f"`product_id` = '{laravel_product_id}' AND `image` LIKE '%odoo.eboutiques.com%'"
-            )
-            
-            synced_count = 0
-            
-            # First, ensure main image is updated with image_1920
-            main_image_url = f"https://odoo.eboutiques.com/public/product_image/{product_template_id}/image_1920"
-            print(f"\n  🖼️  Updating main cover image: {main_image_url}")
-            
-            self.sql_connector.update(
-                "products",
-                f"`id` = '{laravel_product_id}'",
-                {"thumb_image": main_image_url}
-            )
-            print(f"  ✅ Main cover image updated")
-            
-            # Now sync gallery images (image_1, image_2, etc.)
-            # These are separate from the main image_1920
-            print(f"\n  📸 Syncing gallery images...")
-            
-            for i in range(1, 11):  # Check up to 10 gallery images
-                # Gallery images use image_1, image_2, etc. (NOT image_1920)
-                gallery_image_url = f"https://odoo.eboutiques.com/public/product_image/{product_template_id}/image_{i}"
+            # Delete, cover update and inserts land together or not at all
+            with self.sql_connector.transaction():
+                # Clear existing gallery for this product (from sync)
+                self.sql_connector.delete(
+                    "product_galleries", 
+                    "`product_id` = %s AND `image` LIKE %s",
+                    [laravel_product_id, "%odoo.eboutiques.com%"],
+                )
                 
-                print(f"  🔍 Adding gallery image_{i}")
+                # First, ensure main image is updated with image_1920
+                main_image_url = f"https://odoo.eboutiques.com/public/product_image/{product_template_id}/image_1920"
+                print(f"\n  🖼️  Updating main cover image: {main_image_url}")
                 
-                # Insert URL directly - Laravel ImageHelper handles validation
-                gallery_data = {
-                    "product_id": laravel_product_id,
-                    "image": gallery_image_url,
-                    "status": 1,
-                    "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    "updated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
+                self.sql_connector.update(
+                    "products",
+                    "`id` = %s",
+                    {"thumb_image": main_image_url},
+                    [laravel_product_id],
+                )
+                print(f"  ✅ Main cover image updated")
                 
-                try:
-                    result = self.sql_connector.insert("product_galleries", gallery_data).fetch()
-                    if result:
-                        synced_count += 1
-                        print(f"    ✅ Gallery image_{i} stored: {gallery_image_url}")
-                    else:
-                        print(f"    ⚠️  Failed to insert gallery image_{i}")
-                        # If we've synced some images but this one failed, 
-                        # it might mean there are no more images
-                        if synced_count > 0 and i > synced_count + 2:
-                            print(f"    ℹ️  Stopping - likely no more gallery images after {synced_count}")
-                            break
-                except Exception as e:
-                    # Might be duplicate or no more images, skip
-                    print(f"    ⚠️  Could not insert image_{i}: {str(e)}")
-                    # If we've already found some images and get errors, 
-                    # it probably means no more images exist
-                    if synced_count > 0 and "Duplicate" not in str(e):
-                        print(f"    ℹ️  Stopping - likely no more gallery images")
-                        break
-                    continue
+                # Now sync the gallery images Odoo has, in one statement
+                synced_count = self.sql_connector.bulk_insert(
+                    "product_galleries", self.gallery_rows(product_template_id, laravel_product_id, image_fields)
+                ).rowcount
+            
+            if self.catalog is not None and self.catalog.product(product_template_id) is not None:
+                self.catalog.put_product(product_template_id, thumb_image=main_image_url)
             
             print(f"\n📊 Gallery sync summary:")
             print(f"  - Main cover image: image_1920 ✅")
-            print(f"  - Gallery images synced: {synced_count} (image_1 to image_{synced_count})")
+            print(f"  - Gallery images synced: {synced_count} ({', '.join(image_fields) or 'none in Odoo'})")
             print(f"🎉 Total: 1 main image + {synced_count} gallery images")
             
             return synced_count
@@ -156,8 +263,46 @@ class ProductHelper:
             traceback.print_exc()
             return 0
 
-    def upsert_product_variant(self, v, attrs, product_id, tax_info, template_id=None):
-        """Updated variant upsert with tax information and template_id for images"""
+    def sync_product_galleries(self, products):
+        """Gallery sync for many ``(odoo_template, laravel_product_id)`` pairs.
+
+        One DELETE and one multi-row INSERT for all of them; the cover image
+        is already part of the product rows. Templates without their gallery
+        fields (raw records from callers) get them from one manifest read, so
+        only images Odoo has are written and none are dropped.
+        """
+        if not products:
+            return 0
+        unread = [{"id": t["id"]} for t, _ in products
+                  if any(field not in t for field in self.GALLERY_IMAGE_FIELDS)]
+        if unread:
+            self.apply_image_manifest(unread, self.GALLERY_IMAGE_FIELDS)
+        read = {t["id"]: t for t in unread}
+        laravel_ids = [laravel_id for _, laravel_id in products]
+        placeholders = ", ".join(["%s"] * len(laravel_ids))
+        self.sql_connector.execute(
+            f"DELETE FROM `product_galleries` WHERE `product_id` IN ({placeholders}) AND `image` LIKE %s",
+            laravel_ids + ["%odoo.eboutiques.com%"],
+        )
+        rows = []
+        for template, laravel_id in products:
+            template = read.get(template["id"], template)
+            rows.extend(self.gallery_rows(template["id"], laravel_id, self.gallery_fields(template)))
+        return self.sql_connector.bulk_insert("product_galleries", rows).rowcount
+
+    # Columns refreshed when the row already exists (everything else, like
+    # the slug and uuid, is only written on insert)
+    PRODUCT_UPDATE_COLUMNS = [
+        "name", "short_name", "qty", "price", "price_without_tax", "tax_rate", "tax_amount",
+        "thumb_image", "weight", "status", "remote_key_id",
+    ]
+    VARIANT_UPDATE_COLUMNS = [
+        "stock", "price", "price_without_tax", "cost_price", "tax_rate", "tax_amount",
+        "details", "name", "status", "weight", "image",
+    ]
+
+    def variant_row(self, v, attrs, product_id, tax_info, template_id=None):
+        """product_variants row for an Odoo variant, or None when it has no SKU"""
         if (
             v["default_code"] is False
             or v["default_code"] is None
@@ -208,10 +353,8 @@ class ProductHelper:
             # Use template_id if provided, otherwise fall back to variant id
             image_id = template_id if template_id else v['id']
             variant_image = f"https://odoo.eboutiques.com/public/product_image/{image_id}/image_1920"
-            print(f"🔗 Using variant image URL: {variant_image}")
 
-        # Prepare variant data
-        variant_data = {
+        return {
             "name": v["display_name"],
             "product_id": product_id,
             "sku": v["default_code"],
@@ -234,54 +377,31 @@ class ProductHelper:
             "image": variant_image  # Add variant image URL
         }
 
-        # Enhanced update data with all current values
-        update_data = {
-            "stock": v["qty_available"],
-            "price": variant_price_with_tax,
-            "price_without_tax": round(variant_price_without_tax, 2),
-            "cost_price": v["standard_price"],
-            "tax_rate": tax_info["tax_rate"],
-            "tax_amount": round(variant_tax_amount, 2),
-            "details": json.dumps(details),
-            "name": v["display_name"],
-            "status": 1 if v.get("active", True) else 0,
-            "weight": v["weight"] * 1000,
-            "image": variant_image  # Add variant image URL
-        }
+    def upsert_product_variant(self, v, attrs, product_id, tax_info, template_id=None):
+        """Updated variant upsert with tax information and template_id for images"""
+        variant_data = self.variant_row(v, attrs, product_id, tax_info, template_id)
+        if variant_data is None:
+            return None
 
         try:
             sqlProdVariant = (
                 self.sql_connector
-                .upsert(
-                    "product_variants",
-                    variant_data,
-                    updatedData=update_data,
-                    where_clause=" `remote_key_id` = '%s' " % str(v["id"]),
-                )
+                .bulk_upsert("product_variants", [variant_data], "remote_key_id", self.VARIANT_UPDATE_COLUMNS)
                 .fetch()
             )
             
             if sqlProdVariant:
                 print(f"  ✅ Variant synced: {v['display_name']} (SKU: {v['default_code']})")
+                return sqlProdVariant[0]
             
-            return sqlProdVariant
+            return None
             
         except Exception as e:
             print(f"  ❌ Variant sync failed for {v.get('display_name', 'Unknown')}: {str(e)}")
             return None
 
-    def upsert_product_template(self, p, variants, attrs):
-        """Updated product template upsert with tax information"""
-        print(f"\n{'='*60}")
-        print(f"📦 Processing: {p['name']}")
-        print(f"🆔 Odoo ID: {p['id']}")
-        print(f"💰 Price: {p['list_price']}")
-        print(f"📊 Stock: {p['qty_available']}")
-
-        # Get tax information for this product
-        tax_info = self.get_product_tax_info(p["id"])
-        print(f"🏷️  Tax: {tax_info['tax_rate']}% (Amount: {tax_info['tax_amount']:.2f})")
-
+    def product_row(self, p, tax_info):
+        """products row for an Odoo template"""
         # Calculate product price considering tax
         product_price_with_tax = p["list_price"]
         if tax_info["has_tax"]:
@@ -293,15 +413,13 @@ class ProductHelper:
 
         # Handle product image - use Odoo public URL directly
         product_image = f"https://odoo.eboutiques.com/public/product_image/{p['id']}/image_1920"
-        print(f"🔗 Using Odoo main image URL: {product_image}")
 
         # Generate unique slug
         slug_base = slugify(p["name"])
         timestamp = int(datetime.now().timestamp())
         slug = f"{slug_base}-{p['id']}-{timestamp}"
 
-        # Prepare product data
-        product_data = {
+        return {
             "name": p["name"],
             "short_name": p["name"][:100] if len(p["name"]) > 100 else p["name"],
             "slug": slug,
@@ -327,100 +445,115 @@ class ProductHelper:
             "remote_key_id": str(p["id"]),
         }
 
-        # Enhanced update data - sync all current values from Odoo
-        update_data = {
-            "name": p["name"],
-            "short_name": p["name"][:100] if len(p["name"]) > 100 else p["name"],
-            "qty": p["qty_available"],
-            "price": product_price_with_tax,
-            "price_without_tax": round(product_price_without_tax, 2),
-            "tax_rate": tax_info["tax_rate"],
-            "tax_amount": round(product_tax_amount, 2),
-            "thumb_image": product_image,
-            "weight": p["weight"] * 1000,
-            "status": 1 if p.get("active", True) else 0,
-            "remote_key_id": str(p["id"]),
-        }
-
-        try:
-            sqlProd = (
-                self.sql_connector
-                .upsert(
-                    "products",
-                    product_data,
-                    updatedData=update_data,
-                    where_clause=" `remote_key_id` = '%s' " % str(p["id"]),
-                )
-                .fetch()
+    def upsert_product_templates(self, entries):
+        """Write templates with their variants and galleries in bulk.
+
+        ``entries`` are ``(template, variants, attrs, tax_info)`` tuples. All
+        products go out in one INSERT ... ON DUPLICATE KEY UPDATE, then all
+        variants, the obsolete-variant cleanup and the galleries, so a page
+        of templates costs a handful of statements. Returns the Laravel
+        product id per Odoo template id.
+        """
+        if not entries:
+            return {}
+
+        # One transaction for the whole batch: a single commit, and either
+        # all of its products are written or none
+        with self.sql_connector.transaction():
+            laravel_ids, product_rows, variant_rows = self._upsert_product_templates(entries)
+
+        # Only once committed, so a rolled back page leaves the index alone
+        if self.catalog is not None:
+            for row in product_rows:
+                laravel_id = laravel_ids.get(int(row["remote_key_id"]))
+                if laravel_id is not None:
+                    self.catalog.put_product(
+                        row["remote_key_id"], id=laravel_id, name=row["name"], qty=row["qty"],
+                        thumb_image=row["thumb_image"], status=row["status"],
+                    )
+            for row in variant_rows:
+                self.catalog.put_variant(row["product_id"], row["remote_key_id"], stock=row["stock"], status=row["status"])
+        return laravel_ids
+
+    def _upsert_product_templates(self, entries):
+        product_rows = [self.product_row(p, tax_info) for p, _, _, tax_info in entries]
+        written = self.sql_connector.bulk_upsert(
+            "products", product_rows, "remote_key_id", self.PRODUCT_UPDATE_COLUMNS
+        ).fetch_all()
+        laravel_ids = {int(row["remote_key_id"]): row["id"] for row in written}
+
+        variant_rows = []
+        current_skus = []
+        for p, variants, attrs, tax_info in entries:
+            product_laravel_id = laravel_ids.get(p["id"])
+            if product_laravel_id is None:
+                print(f"❌ ERROR: Product {p['id']} not found after upsert!")
+                continue
+            for v in variants:
+                if not v.get("default_code"):  # Only sync variants with SKU
+                    continue
+                related_attr = [a for a in attrs if a["id"] in v["product_template_variant_value_ids"]]
+                related_attr = list({a["id"]: a for a in related_attr}.values())
+                row = self.variant_row(v, related_attr, product_laravel_id, tax_info, p["id"])
+                if row is not None:
+                    variant_rows.append(row)
+                    current_skus.append((product_laravel_id, v["default_code"]))
+
+        if variant_rows:
+            self.sql_connector.bulk_upsert(
+                "product_variants", variant_rows, "remote_key_id", self.VARIANT_UPDATE_COLUMNS, read_back=False
             )
+            print(f"✅ Synced {len(variant_rows)} variants")
+
+            # Disable variants of these products whose SKU is gone from Odoo
+            try:
+                product_ids = list({product_id for product_id, _ in current_skus})
+                sql = "UPDATE `product_variants` SET `status` = 0, `updated_at` = NOW() WHERE `product_id` IN (%s) AND (`product_id`, `sku`) NOT IN (%s)" % (
+                    ", ".join(["%s"] * len(product_ids)),
+                    ", ".join(["(%s, %s)"] * len(current_skus)),
+                )
+                self.sql_connector.execute(sql, product_ids + [value for pair in current_skus for value in pair])
+                print("✅ Cleaned up obsolete variants")
+            except Exception as e:
+                print(f"⚠️  Variant cleanup warning: {str(e)}")
+
+        gallery_count = self.sync_product_galleries(
+            [(p, laravel_ids[p["id"]]) for p, _, _, _ in entries if p["id"] in laravel_ids]
+        )
+        print(f"✅ Wrote {len(laravel_ids)} products, {len(variant_rows)} variants, {gallery_count} gallery images")
+        return laravel_ids, product_rows, variant_rows
+
+    def upsert_product_template(self, p, variants, attrs, taxes=None):
+        """Updated product template upsert with tax information
+        
+        ``taxes`` are the template's account.tax records when the caller
+        already prefetched them (see prefetch_page); otherwise they are read
+        from Odoo here.
+        """
+        print(f"\n{'='*60}")
+        print(f"📦 Processing: {p['name']}")
+        print(f"🆔 Odoo ID: {p['id']}")
+        print(f"💰 Price: {p['list_price']}")
+        print(f"📊 Stock: {p['qty_available']}")
+
+        # Get tax information for this product
+        if taxes is not None:
+            tax_info = self.tax_info(p["list_price"], taxes)
+        else:
+            tax_info = self.get_product_tax_info(p["id"], p.get("write_date"))
+        print(f"🏷️  Tax: {tax_info['tax_rate']}% (Amount: {tax_info['tax_amount']:.2f})")
 
-            if sqlProd is None:
-                print("⚠️  Product sync returned None - checking existing record...")
-                existing = self.sql_connector.getOne("products", f"`remote_key_id` = '{p['id']}'").fetch()
-                if existing:
-                    print(f"✅ Product exists with Laravel ID: {existing['id']}")
-                    sqlProd = existing
-                else:
-                    print("❌ ERROR: Product not found after upsert!")
-                    return None
-
-            if not sqlProd.get("id"):
-                print("❌ Product sync failed - no ID returned")
+        try:
+            product_laravel_id = self.upsert_product_templates([(p, variants, attrs, tax_info)]).get(p["id"])
+            if product_laravel_id is None:
                 return None
 
-            product_laravel_id = sqlProd["id"]
             print(f"✅ Product synced to Laravel ID: {product_laravel_id}")
-
-            # Update variants with tax and image information
-            synced_variants = 0
-            variant_errors = 0
-            
-            print(f"🔧 Processing {len(variants)} variants...")
-            
-            for v in variants:
-                if v.get("default_code") and v["default_code"]:  # Only sync variants with SKU
-                    related_attr = [
-                        a for a in attrs if a["id"] in v["product_template_variant_value_ids"]
-                    ]
-                    related_attr = list({a["id"]: a for a in related_attr}.values())
-                    
-                    variant_result = self.upsert_product_variant(v, related_attr, product_laravel_id, tax_info, p['id'])
-                    if variant_result:
-                        synced_variants += 1
-                    else:
-                        variant_errors += 1
-
-            print(f"✅ Synced {synced_variants} variants ({variant_errors} errors)")
-
-            # Cleanup obsolete variants (simplified to avoid syntax issues)
-            if synced_variants > 0:
-                try:
-                    current_skus = [v["default_code"] for v in variants if v.get("default_code")]
-                    if current_skus:
-                        # Build a safe query to disable old variants
-                        sku_list = "', '".join(current_skus)
-                        cleanup_query = f"`product_id` = '{product_laravel_id}' AND `sku` NOT IN ('{sku_list}')"
-                        self.sql_connector.update("product_variants", cleanup_query, {"status": 0})
-                        print("✅ Cleaned up obsolete variants")
-                except Exception as e:
-                    print(f"⚠️  Variant cleanup warning: {str(e)}")
-
-            # Sync product gallery (multiple images)
-            gallery_count = self.sync_product_gallery(p["id"], product_laravel_id)
-
-            print(f"📊 Summary:")
-            print(f"  - Laravel ID: {product_laravel_id}")
-            print(f"  - Price: {product_price_with_tax} (includes {tax_info['tax_rate']}% tax)")
-            print(f"  - Stock: {p['qty_available']}")
-            print(f"  - Image: {product_image}")
-            print(f"  - Variants: {synced_variants}")
-            print(f"  - Gallery Images: {gallery_count}")
             print("✅ Product sync completed successfully")
-            
-            return sqlProd
+            return {"id": product_laravel_id, "remote_key_id": str(p["id"])}
 
         except Exception as e:
             print(f"❌ Product sync failed for {p.get('name', 'Unknown')}: {str(e)}")
             import traceback
             traceback.print_exc()
-            return None
\ No newline at end of file
+            return None
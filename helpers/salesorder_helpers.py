@@ -1,8 +1,10 @@
+import asyncio
 import datetime
 import json
 
 from numpy import number
 from helpers.helpers import slugify
+from helpers.odoo_async import AsyncOdooConnector
 from helpers.odoo_connector import OdooConnector
 from helpers.sql_connector import SQLConnector
 from helpers.stock_helpers import StockPickingOrder
@@ -54,23 +56,32 @@ class SalesOrderHelper:
             if product_line.get("price") is None:
                 raise Exception("price is required")
 
-            product_id = self.connector.search(
+        # Lines are independent: look all SKUs up concurrently instead of
+        # paying one search + one read round trip per line
+        async_connector = AsyncOdooConnector(self.connector)
+        product_ids = asyncio.run(
+            async_connector.gather_searches(
                 "product.product",
-                [("default_code", "=", product_line.get("sku"))],
+                [[("default_code", "=", product_line.get("sku"))] for product_line in products],
                 offset=0,
                 limit=1,
             )
+        )
 
+        for product_line, product_id in zip(products, product_ids):
             if len(product_id) <= 0:
                 raise Exception("Product %s not found" % product_line.get("sku"))
 
-            # check product availablity
-            [odooProduct] = self.connector.read(
+        # check product availablity
+        odooProducts = asyncio.run(
+            async_connector.gather_reads(
                 "product.product",
-                product_id,
+                product_ids,
                 ["qty_available", "name", "uom_id", "display_name"],
             )
+        )
 
+        for product_line, product_id, [odooProduct] in zip(products, product_ids, odooProducts):
             #print("[sales_order] odooProduct : ", odooProduct)
 
             if float(odooProduct["qty_available"]) < float(
@@ -1,9 +1,11 @@
+import hashlib
 import json
 import pymysql.cursors
 import threading
 import time
 import random
 from contextlib import contextmanager
+from datetime import datetime
 
 from helpers.helpers import print_html
 import os
@@ -12,6 +14,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Append only: a migration's version is its position in this list, and the
+# schema_migrations ledger records each version once it has been applied
 migrations = [
     """ALTER TABLE `products` ADD `remote_key_id` VARCHAR(101) NULL DEFAULT NULL AFTER `uuid`; 
     ALTER TABLE `products` ADD UNIQUE(`remote_key_id`);
@@ -46,10 +50,47 @@ migrations = [
     ADD `odoo_order_id` VARCHAR(255) NULL DEFAULT NULL AFTER `remote_key_id`,
     ADD `stock_status` VARCHAR(100) NULL DEFAULT NULL AFTER `odoo_order_id`;
     """,
+    # products.remote_key_id only got its unique index where the first
+    # migration ran on an empty schema; add it where it is still missing
+    """
+    SET @has_unique = (SELECT COUNT(*) FROM (
+        SELECT `INDEX_NAME` FROM `information_schema`.`STATISTICS`
+        WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = 'products' AND `NON_UNIQUE` = 0
+        GROUP BY `INDEX_NAME` HAVING COUNT(*) = 1 AND MAX(`COLUMN_NAME`) = 'remote_key_id'
+    ) AS `unique_keys`);
+    SET @add_unique = IF(@has_unique > 0, 'DO 0',
+        'ALTER TABLE `products` ADD UNIQUE `products_remote_key_id_unique` (`remote_key_id`)');
+    PREPARE add_unique FROM @add_unique;
+    EXECUTE add_unique;
+    DEALLOCATE PREPARE add_unique;
+    """,
 ]
 
+MIGRATION_LEDGER = """
+    CREATE TABLE IF NOT EXISTS `schema_migrations` (
+        `version` INT UNSIGNED NOT NULL PRIMARY KEY,
+        `checksum` CHAR(64) NOT NULL,
+        `execution_ms` INT UNSIGNED NOT NULL DEFAULT 0,
+        `applied_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Table exists, duplicate column, duplicate key: the statement already ran
+# (databases migrated before the ledger existed)
+ALREADY_APPLIED_ERRORS = (1050, 1060, 1061)
+
 
 class ConnectionPool:
+    """Bounded pool of MySQL connections shared by every SQLConnector.
+
+    At most ``max_size`` connections exist at once; callers beyond that wait
+    up to ``wait_timeout`` seconds for one to come back instead of opening
+    extra connections. Connections idle for ``ping_after`` seconds are
+    pinged before being handed out, connections older than
+    ``max_lifetime`` are replaced, and idle ones are closed after
+    ``idle_timeout`` seconds while keeping ``min_size`` around.
+    """
+
     _instance = None
     _lock = threading.Lock()
     
@@ -62,31 +103,115 @@ class ConnectionPool:
     
     def __init__(self):
         if not hasattr(self, 'initialized'):
-            self.pool = []
-            self.pool_size = 2  # Reduced to avoid overwhelming the DB
-            self.current_size = 0
-            self.lock = threading.Lock()
+            self.max_size = max(1, int(os.getenv("DB_POOL_MAX_SIZE", "4")))
+            self.min_size = min(self.max_size, int(os.getenv("DB_POOL_MIN_SIZE", "1")))
+            self.wait_timeout = float(os.getenv("DB_POOL_WAIT_TIMEOUT", "30"))
+            self.max_lifetime = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+            self.idle_timeout = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+            self.ping_after = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+            self.pool = []  # idle (connection, created_at, last_used), most recent last
+            self.size = 0  # open connections, idle or in use
+            self.in_use = 0
+            self.condition = threading.Condition()
+            self.created = 0
+            self.recycled = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.wait_time_total = 0.0
+            self.wait_time_max = 0.0
+            self._created_at = {}
             self.initialized = True
     
     def get_connection(self):
-        with self.lock:
-            if self.pool:
-                return self.pool.pop()
-            elif self.current_size < self.pool_size:
-                self.current_size += 1
-                return self._create_connection()
-            else:
-                # If pool is full, create a temporary connection
-                return self._create_connection()
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self.condition:
+                self._evict_idle()
+                while not self.pool and self.size >= self.max_size:
+                    remaining = self.wait_timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise Exception("No MySQL connection free within %ss (%d in use)" % (self.wait_timeout, self.in_use))
+                    waited = True
+                    self.condition.wait(remaining)
+                if waited:
+                    self._record_wait(time.monotonic() - started)
+                    waited = False
+                if self.pool:
+                    conn, created_at, last_used = self.pool.pop()
+                else:
+                    conn, created_at, last_used = None, None, None
+                    self.size += 1
+                self.in_use += 1
+
+            if conn is None:
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    self._discard(None)
+                    raise
+                with self.condition:
+                    self.created += 1
+                    self._created_at[id(conn)] = time.monotonic()
+                return conn
+
+            now = time.monotonic()
+            if now - created_at > self.max_lifetime or (now - last_used > self.ping_after and not self._alive(conn)):
+                self._discard(conn)
+                continue
+            return conn
+
+    def _record_wait(self, seconds):
+        self.waits += 1
+        self.wait_time_total += seconds
+        self.wait_time_max = max(self.wait_time_max, seconds)
+
+    @staticmethod
+    def _alive(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        # Called with the condition held; oldest idle connections come first
+        now = time.monotonic()
+        while self.pool and self.size > self.min_size and now - self.pool[0][2] > self.idle_timeout:
+            conn = self.pool.pop(0)[0]
+            self._close(conn)
+            self.size -= 1
+            self.recycled += 1
+
+    def _close(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _discard(self, conn):
+        # Drop a borrowed connection (dead, too old or never opened)
+        with self.condition:
+            if conn is not None:
+                self._close(conn)
+                self.recycled += 1
+            self.size -= 1
+            self.in_use -= 1
+            self.condition.notify()
     
     def return_connection(self, conn):
-        if conn and conn.open:
-            with self.lock:
-                if len(self.pool) < self.pool_size:
-                    self.pool.append(conn)
-                else:
-                    conn.close()
-                    self.current_size -= 1
+        if conn is None:
+            return
+        created_at = self._created_at.get(id(conn))
+        if not conn.open or created_at is None or time.monotonic() - created_at > self.max_lifetime:
+            self._discard(conn)
+            return
+        with self.condition:
+            self.pool.append((conn, created_at, time.monotonic()))
+            self.in_use -= 1
+            self.condition.notify()
     
     def _create_connection(self, retries=3):
         for attempt in range(retries):
@@ -111,26 +236,49 @@ class ConnectionPool:
                     raise
     
     def close_all(self):
-        with self.lock:
-            for conn in self.pool:
-                try:
-                    conn.close()
-                except:
-                    pass
+        """Close the idle connections; borrowed ones are closed when returned"""
+        with self.condition:
+            for conn, _, _ in self.pool:
+                self._close(conn)
+            self.size -= len(self.pool)
             self.pool.clear()
-            self.current_size = 0
+            # Connections still borrowed are forgotten and so not pooled again
+            self._created_at.clear()
+
+    def metrics(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "idle": len(self.pool),
+                "max_size": self.max_size,
+                "created": self.created,
+                "recycled": self.recycled,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_time_total / self.waits * 1000, 1) if self.waits else 0,
+                "wait_ms_max": round(self.wait_time_max * 1000, 1),
+            }
 
 class SQLConnector:
     _results = None
     _debug = False
+    # Outcome of the last write statement
+    rowcount = 0
+    lastrowid = None
     _pool = ConnectionPool()
 
     def __init__(self, debug=False) -> None:
         self._debug = debug
         self.connection = None
+        self._transaction = None
 
     @contextmanager
     def get_connection(self):
+        if self._transaction is not None:
+            # Inside transaction(): every statement runs on the pinned connection
+            yield self._transaction
+            return
         conn = self._pool.get_connection()
         try:
             self.connection = conn
@@ -139,26 +287,108 @@ class SQLConnector:
             self._pool.return_connection(conn)
             self.connection = None
 
+    @contextmanager
+    def transaction(self):
+        """Unit of work: pin one connection and commit once at the end.
+
+        Writes inside the block skip their own commits and are committed
+        together when it exits, or rolled back if it raises. Nested blocks
+        join the outer one.
+        """
+        if self._transaction is not None:
+            yield self
+            return
+        with self.get_connection() as conn:
+            self._transaction = conn
+            try:
+                yield self
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._transaction = None
+
+    def _commit(self, conn):
+        if conn is not self._transaction:
+            conn.commit()
+
+    def _rollback(self, conn):
+        # Inside a transaction the failed statement is already undone by
+        # MySQL; the rest is up to transaction()
+        if conn is not self._transaction:
+            conn.rollback()
+
     def onDebug(self, msg):
         if self._debug:
             print("[db.debug] ", msg)
             print("[db.debug._results] ", json.dumps(self._results, default=str))
         return self
 
-    def migrate(self):
+    @staticmethod
+    def migration_checksum(migration):
+        return hashlib.sha256(" ".join(migration.split()).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def migration_statements(migration):
+        # One statement per execute(); the connection has no multi-statements
+        return [statement.strip() for statement in migration.split(";") if statement.strip()]
+
+    def migrate(self, lock_timeout=60):
+        """Apply the migrations missing from the schema_migrations ledger.
+
+        The applied versions are read in one primary key scan, so a deploy
+        with nothing to do runs no ALTER at all. A named lock keeps two
+        workers starting together from migrating at the same time.
+        """
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 print ("[migration] started")
-                for migration in migrations:
-                    try:
-                        cursor.execute(migration)
-                        conn.commit()
-                    except Exception as e:
-                        # rollback
-                        self.onDebug("[migration] rollback" + str(e))
-                        conn.rollback()
-                    pass
+                cursor.execute(MIGRATION_LEDGER)
+                cursor.execute("SELECT GET_LOCK('schema_migrations', %s) AS `locked`", [lock_timeout])
+                if not cursor.fetchone()["locked"]:
+                    raise Exception("[migration] another worker holds the migration lock")
+                try:
+                    cursor.execute("SELECT `version`, `checksum` FROM `schema_migrations`")
+                    applied = {row["version"]: row["checksum"] for row in cursor.fetchall()}
+                    for version, migration in enumerate(migrations, start=1):
+                        checksum = self.migration_checksum(migration)
+                        if version in applied:
+                            if applied[version] != checksum:
+                                print(f"[migration] {version} changed after it was applied, not running it again")
+                            continue
+                        self._apply_migration(conn, cursor, version, migration, checksum)
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK('schema_migrations')")
+                print ("[migration] done")
         return self
+
+    def _apply_migration(self, conn, cursor, version, migration, checksum):
+        started = time.monotonic()
+        skipped = 0
+        for statement in self.migration_statements(migration):
+            try:
+                cursor.execute(statement)
+            except pymysql.err.MySQLError as e:
+                conn.rollback()
+                if e.args and e.args[0] in ALREADY_APPLIED_ERRORS:
+                    # Only this statement is in the schema already; the
+                    # rest of the migration may never have run
+                    skipped += 1
+                    continue
+                # Left out of the ledger, so the next deploy tries again
+                print(f"[migration] {version} failed: {str(e)}")
+                return False
+        cursor.execute(
+            "INSERT INTO `schema_migrations` (`version`, `checksum`, `execution_ms`) VALUES (%s, %s, %s)",
+            [version, checksum, int((time.monotonic() - started) * 1000)],
+        )
+        conn.commit()
+        if skipped:
+            print(f"[migration] {version} applied ({skipped} statement(s) already in the schema)")
+        else:
+            print(f"[migration] {version} applied")
+        return True
        
 
     def getAll(self, table_name, where_clause=None, fields=None, select="*"):
@@ -191,79 +421,307 @@ class SQLConnector:
                 self._results = result
                 return self
 
+    def iter_rows(self, table_name, where_clause=None, columns=None, batch=500, params=None):
+        """Stream matching rows through an unbuffered server-side cursor.
+
+        Rows are pulled ``batch`` at a time with an SSDictCursor, so a scan of
+        the whole catalog runs in constant memory and the caller starts on
+        the first rows before MySQL has sent the last ones. The connection
+        stays borrowed until the generator is exhausted or closed; writes
+        made while iterating go through other pooled connections. Keep the
+        per-row work short: MySQL drops a reader that stalls longer than
+        its net_write_timeout.
+        """
+        select = ", ".join("`%s`" % c for c in columns) if columns else "*"
+        sql = "SELECT %s FROM `%s`" % (select, table_name)
+        if where_clause is not None:
+            sql += " WHERE " + where_clause
+        if self._transaction is not None:
+            raise Exception("iter_rows() cannot stream inside a transaction")
+        with self.get_connection() as conn:
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            try:
+                self.onDebug("[sql.iter_rows] %s" % sql)
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(batch)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+            finally:
+                # Reads whatever is left of the result so the connection
+                # can be reused
+                cursor.close()
+
     def sanatize(self, data):
         return {key: value.replace("'", '"') if isinstance(value, str) else value for key, value in data.items()}
 
+    # Built statements per (kind, table, columns, where, update columns);
+    # only parameterised where clauses are cached, so the set stays small
+    _statements = {}
 
-    def update(self, table_name, where_clause, data):
-        data = self.sanatize(data)
-        with self.get_connection() as conn:
-            with conn.cursor() as cursor:
-                fields = ", ".join([f"{key} = '{value}'" for key, value in data.items()])
-                # add updated at now to fields
-                fields = fields + ", updated_at = NOW()"
-                sql = f"UPDATE {table_name} SET {fields} WHERE {where_clause}"
-                self.onDebug("[sql.update] %s" % sql)
-                cursor.execute(sql)
-                conn.commit()
-                self.getOne(table_name, where_clause)
-                return self
+    # has_unique_key() answers per (table, column), looked up once per process
+    _unique_keys = {}
+    # (table, column) pairs bulk_upsert() already warned about
+    _row_by_row_warned = set()
+    # (MySQL NOW() minus our clock, when it was measured) for _db_now()
+    _db_clock = None
+
+    @classmethod
+    def _statement(cls, kind, table_name, columns, where_clause=None, update_columns=None, cache=True):
+        key = (kind, table_name, columns, where_clause, update_columns)
+        sql = cls._statements.get(key) if cache else None
+        if sql is not None:
+            return sql
+        if kind in ("insert", "bulk_insert"):
+            stamps = tuple(c for c in ("updated_at", "created_at") if c not in columns)
+            # executemany only folds rows into one multi-row INSERT when the
+            # VALUES are all %s, so there the timestamps are parameters too
+            stamp = "%s" if kind == "bulk_insert" else "NOW()"
+            sql = "INSERT INTO `%s` (%s) VALUES (%s)" % (
+                table_name,
+                ", ".join("`%s`" % c for c in columns + stamps),
+                ", ".join(["%s"] * len(columns) + [stamp] * len(stamps)),
+            )
+            if update_columns:
+                assignments = ["`{0}` = VALUES(`{0}`)".format(c) for c in update_columns]
+                if "updated_at" not in update_columns:
+                    assignments.append("`updated_at` = NOW()")
+                sql += " ON DUPLICATE KEY UPDATE " + ", ".join(assignments)
+        elif kind == "update":
+            assignments = ["`%s` = %%s" % c for c in columns]
+            if "updated_at" not in columns:
+                assignments.append("`updated_at` = NOW()")
+            sql = "UPDATE `%s` SET %s WHERE %s" % (table_name, ", ".join(assignments), where_clause)
+        elif kind == "delete":
+            sql = "DELETE FROM `%s` WHERE %s" % (table_name, where_clause)
+        else:
+            raise Exception("Unknown statement kind %r" % kind)
+        if cache:
+            cls._statements[key] = sql
+        return sql
+
+    @staticmethod
+    def _where(where_clause, params):
+        # A literal where clause goes through the same %-formatting as
+        # parameters, so its own % signs (LIKE patterns) must be escaped
+        if params is None:
+            return where_clause.replace("%", "%%"), [], False
+        return where_clause, list(params), True
+
+    @staticmethod
+    def _insert_values(columns, row, now):
+        stamps = [now for c in ("updated_at", "created_at") if c not in columns]
+        return [row[c] for c in columns] + stamps
 
-    def insert(self, table_name, data, where_clause=None):
-        data = self.sanatize(data)
+    @classmethod
+    def _db_now(cls, cursor):
+        # Bulk INSERT timestamps follow the MySQL clock (and time zone) like
+        # NOW() does elsewhere; the offset to ours is measured once an hour,
+        # not before every batch
+        if cls._db_clock is None or time.monotonic() - cls._db_clock[1] > 3600:
+            cursor.execute("SELECT NOW() AS `now`")
+            cls._db_clock = (cursor.fetchone()["now"] - datetime.now(), time.monotonic())
+        return (datetime.now() + cls._db_clock[0]).replace(microsecond=0)
+
+    def _write(self, sql, params):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
-                fields = ", ".join(data.keys())
-                values = ", ".join([f"'{value}'" for value in data.values()])
+                cursor.execute(sql, params)
+                self._commit(conn)
+                self.rowcount = cursor.rowcount
+                self.lastrowid = cursor.lastrowid
+                self._results = cursor.rowcount
+        return self
 
-                # add created at and updated at
-                fields += ", updated_at, created_at"
-                values += ", NOW(), NOW()"
+    def update(self, table_name, where_clause, data, params=None, read_back=False):
+        """Set ``data`` on the rows matching ``where_clause``.
 
-                sql = f"INSERT INTO {table_name} ({fields}) VALUES ({values})"
-                cursor.execute(sql)
-                self.onDebug("[sql.update] %s" % sql)
-                conn.commit()
-                if where_clause is not None:
-                    self.getOne(table_name, where_clause)
-                return self
+        Values are sent as statement parameters; ``where_clause`` may use
+        ``%s`` placeholders filled from ``params``. ``rowcount`` tells how
+        many rows changed; pass ``read_back=True`` to load the updated row
+        for ``fetch()`` with an extra SELECT.
+        """
+        where_sql, where_params, cache = self._where(where_clause, params)
+        columns = tuple(data.keys())
+        sql = self._statement("update", table_name, columns, where_sql, cache=cache)
+        self.onDebug("[sql.update] %s" % sql)
+        self._write(sql, [data[c] for c in columns] + where_params)
+        if read_back:
+            self.getOne(table_name, where_clause, params)
+        return self
+
+    def insert(self, table_name, data, where_clause=None, params=None, read_back=False):
+        """Insert one row; ``lastrowid`` holds its id.
+
+        With ``read_back=True`` the row is loaded for ``fetch()``, found by
+        ``where_clause`` when given, otherwise by its new id.
+        """
+        columns = tuple(data.keys())
+        sql = self._statement("insert", table_name, columns)
+        self.onDebug("[sql.insert] %s" % sql)
+        self._write(sql, [data[c] for c in columns])
+        if read_back:
+            if where_clause is not None:
+                self.getOne(table_name, where_clause, params)
+            else:
+                self.getOne(table_name, "`id` = %s", [self.lastrowid])
+        return self
 
-    def delete(self, table_name, where_clause):
+    def delete(self, table_name, where_clause, params=None):
         """Delete records from table based on where clause"""
+        where_sql, where_params, cache = self._where(where_clause, params)
+        sql = self._statement("delete", table_name, (), where_sql, cache=cache)
+        self.onDebug("[sql.delete] %s" % sql)
+        return self._write(sql, where_params)
+
+    def upsert(self, table_name, data, updatedData, where_clause, params=None):
+        if self.getOne(table_name, where_clause, params).fetch() is None:
+            return self.insert(table_name, data, where_clause=where_clause, params=params, read_back=True)
+        return self.update(table_name, where_clause, updatedData, params, read_back=True)
+
+    def execute(self, sql, params=None):
+        """Run one statement with ``%s`` placeholders and commit it"""
+        self.onDebug("[sql.execute] %s" % sql)
+        return self._write(sql, params)
+
+    def _executemany(self, sql, param_rows):
+        """executemany(); ``param_rows`` may be a function of the database's
+        current time (see _db_now)"""
         with self.get_connection() as conn:
-            with conn.cursor() as cursor:
-                sql = f"DELETE FROM {table_name} WHERE {where_clause}"
-                self.onDebug("[sql.delete] %s" % sql)
-                cursor.execute(sql)
-                conn.commit()
-                self._results = cursor.rowcount
-                return self
+            try:
+                with conn.cursor() as cursor:
+                    if callable(param_rows):
+                        param_rows = param_rows(self._db_now(cursor))
+                    self.onDebug("[sql.executemany] %s rows: %s" % (len(param_rows), sql))
+                    affected = cursor.executemany(sql, param_rows)
+                self._commit(conn)
+            except Exception:
+                self._rollback(conn)
+                raise
+        return affected or 0
 
-    def upsert(self, table_name, data, updatedData, where_clause):
-        data = self.sanatize(data)
-        if self.getOne(table_name, where_clause).toJSON() is None:
-            return self.insert(table_name, data, where_clause=where_clause)
-        return self.update(table_name, where_clause, updatedData)
+    def _bulk_write(self, table_name, rows, update_columns=None):
+        if not rows:
+            return 0
+        columns = tuple(rows[0].keys())
+        for row in rows:
+            if tuple(row.keys()) != columns:
+                raise Exception("bulk write into %s needs the same columns in every row" % table_name)
+        sql = self._statement("bulk_insert", table_name, columns, update_columns=tuple(update_columns or ()))
+        # pymysql turns this into multi-row INSERTs of up to ~1MB each
+        return self._executemany(sql, lambda now: [self._insert_values(columns, row, now) for row in rows])
 
-    def toJSON(self):
-        if (
+    def bulk_insert(self, table_name, rows):
+        """Insert ``rows`` (dicts with the same keys) in multi-row statements"""
+        self.rowcount = self._results = self._bulk_write(table_name, rows)
+        return self
+
+    def bulk_upsert(self, table_name, rows, key, update_columns, read_back=True):
+        """Insert or update ``rows`` with INSERT ... ON DUPLICATE KEY UPDATE.
+
+        ``key`` is the unique column identifying a row (``remote_key_id``);
+        rows that already exist get ``update_columns`` overwritten. The
+        result is the ``id`` and ``key`` of every written row, read back in
+        one query unless ``read_back`` is off.
+
+        Without a unique index on ``key`` ON DUPLICATE KEY UPDATE would
+        insert duplicates, so the rows are then upserted one by one, several
+        round trips each; that is reported once per process.
+        """
+        if self.has_unique_key(table_name, key):
+            self.rowcount = self._results = self._bulk_write(table_name, rows, update_columns)
+        else:
+            if (table_name, key) not in self._row_by_row_warned:
+                self._row_by_row_warned.add((table_name, key))
+                print(f"⚠️  [sql] NO UNIQUE INDEX on {table_name}.{key}: every bulk upsert falls back to "
+                      f"row by row writes until the migrations add it")
+            for row in rows:
+                self.upsert(table_name, row, {c: row[c] for c in update_columns}, "`%s` = %%s" % key, [row[key]])
+            self.rowcount = self._results = len(rows)
+        if not read_back:
+            return self
+        keys = list({row[key] for row in rows})
+        if not keys:
+            self._results = []
+            return self
+        placeholders = ", ".join(["%s"] * len(keys))
+        return self.getAll(table_name, "`%s` IN (%s)" % (key, placeholders), keys, select="`id`, `%s`" % key)
+
+    def has_unique_key(self, table_name, column):
+        """Whether ``column`` alone is a unique (or primary) key of the table"""
+        cache_key = (table_name, column)
+        if cache_key not in self._unique_keys:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SHOW INDEX FROM `%s`" % table_name)
+                    indexes = {}
+                    for row in cursor.fetchall():
+                        if not int(row["Non_unique"]):
+                            indexes.setdefault(row["Key_name"], []).append(row["Column_name"])
+            self._unique_keys[cache_key] = [column] in indexes.values()
+        return self._unique_keys[cache_key]
+
+    def update_many(self, table_name, rows, key_columns):
+        """Apply one UPDATE per row with executemany.
+
+        Every row holds the same columns; ``key_columns`` of them select the
+        row to update, the others are the new values.
+        """
+        if not rows:
+            self._results = 0
+            return self
+        key_columns = tuple(key_columns)
+        columns = tuple(c for c in rows[0].keys() if c not in key_columns)
+        where_clause = " AND ".join("`%s` = %%s" % c for c in key_columns)
+        sql = self._statement("update", table_name, columns, where_clause)
+        self.rowcount = self._results = self._executemany(sql, [[row[c] for c in columns + key_columns] for row in rows])
+        return self
+
+    def delete_many(self, table_name, rows):
+        """Delete the rows matching each dict of column values, with executemany"""
+        if not rows:
+            self._results = 0
+            return self
+        columns = tuple(rows[0].keys())
+        where_clause = " AND ".join("`%s` = %%s" % c for c in columns)
+        sql = self._statement("delete", table_name, (), where_clause)
+        self.rowcount = self._results = self._executemany(sql, [[row[c] for c in columns] for row in rows])
+        return self
+
+    def _is_empty(self):
+        return (
             self._results is None
-            or len(self._results) == 0
             or self._results is False
-            or self._results == "null"
-        ):
+            or (isinstance(self._results, (list, tuple, dict)) and len(self._results) == 0)
+        )
+
+    def toJSON(self):
+        """JSON export of the last result; Decimal and datetime become strings"""
+        if self._is_empty():
             return None
         return json.dumps(self._results, default=str)
 
     def fetch(self):
-        json_data = self.toJSON()
-        if json_data is None:
-            return None
-        try:
-            return json.loads(json_data)
-        except (json.JSONDecodeError, TypeError) as e:
-            print(f"❌ JSON decode error: {str(e)}")
+        """Result of the last query as the cursor returned it.
+
+        One row dict for getOne, a list of row dicts for getAll, None when
+        nothing matched. Values keep their MySQL types (Decimal, datetime,
+        ...); use toJSON() when the result has to be serialised.
+        """
+        if self._is_empty():
             return None
+        if isinstance(self._results, tuple):
+            return list(self._results)
+        return self._results
+
+    def fetch_all(self):
+        """Rows of the last query as a list, [] when there are none"""
+        rows = self.fetch()
+        if isinstance(rows, dict):
+            return [rows]
+        return rows if isinstance(rows, list) else []
 
     def toHTML(self):
         return print_html(self.toJSON())
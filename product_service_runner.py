@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import xmlrpc.client
 import base64
@@ -8,8 +9,10 @@ from time import sleep
 
 from json2html import *
 
-from helpers.file_helper import read_time_stamp, write_time_stamp
-from helpers.helpers import flatten, odooReadSearch
+from helpers.file_helper import read_time_stamp, read_watermark, read_watermark_retries, write_watermark
+from helpers.catalog_index import CatalogIndex
+from helpers.helpers import odooReadSearchIter, odooReadSearchPages
+from helpers.odoo_async import AsyncOdooConnector
 from helpers.odoo_connector import OdooConnector
 from helpers.product_helpers import ProductHelper
 from helpers.sql_connector import SQLConnector
@@ -43,166 +46,214 @@ def get_odoo_image_url(product_id, field_name='image_1920'):
         print(f"❌ Failed to check image URL for product {product_id}: {str(e)}")
         return "no_product_image.jpg"
 
-def sync_product_updates(connector, sql_connector, helper, limit=50):
-    """Sync recent product updates from Odoo"""
+TEMPLATE_SYNC_FIELDS = [
+    "name",
+    "list_price", 
+    "standard_price",
+    "type",
+    "qty_available",
+    "product_tag_ids",
+    "default_code",
+    "id",
+    "write_date",
+    "weight",
+    "taxes_id",
+    "supplier_taxes_id",
+    "categ_id",
+    "active"       # Product status
+    # image_1920/1024/512 and the image_1..image_10 gallery are filled in
+    # from ir.attachment checksums by ProductHelper.apply_image_manifest
+    # rather than downloaded
+]
+
+VARIANT_SYNC_FIELDS = [
+    "name",
+    "display_name", 
+    "code",
+    "default_code",
+    "id",
+    "product_template_variant_value_ids",
+    "product_tmpl_id",
+    "qty_available",
+    "lst_price",
+    "standard_price",
+    "weight",
+    "taxes_id",
+    "supplier_taxes_id",
+    "active",
+    # image_1920 (variant image) comes from ProductHelper.apply_image_manifest
+]
+
+def sync_product_page(connector, sql_connector, helper, product_templates):
+    """Sync one page of product templates with their variants and attributes
+    
+    Returns the ids of the templates that could not be written.
+    """
+    failed = []
+    # Variants, attribute values and taxes for the whole page, one fetch
+    # per related model
+    prefetch = helper.prefetch_page(product_templates, VARIANT_SYNC_FIELDS)
+    products = prefetch.variants
     
-    # Get timestamp for recent changes (last 24 hours or since last sync)
-    last_sync_at = read_time_stamp("product_time_stamp.txt")
-    print(f"Syncing products updated since: {last_sync_at}")
+    print(f"📦 Found {len(products)} updated product variants")
     
+    # Image presence from attachment checksums, one RPC per model per page
+    helper.apply_image_manifest(
+        product_templates, ProductHelper.TEMPLATE_IMAGE_FIELDS + ProductHelper.GALLERY_IMAGE_FIELDS, variants=products)
+    
+    # Prepare each updated product template; they are written together below
+    entries = []
+    for pt in product_templates:
+        try:
+            print(f"\n{'='*60}")
+            print(f"📦 Processing: {pt['name']}")
+            print(f"🔄 Last updated: {pt['write_date']}")
+            print(f"💰 Price: {pt['list_price']}")
+            print(f"📊 Stock: {pt['qty_available']}")
+            print(f"🏷️  Has taxes: {bool(pt.get('taxes_id'))}")
+            print(f"🖼️  Has image: {bool(pt.get('image_1920'))}")
+            print(f"🔍 Image fields: image_1920={bool(pt.get('image_1920'))}, image_1024={bool(pt.get('image_1024'))}, image_512={bool(pt.get('image_512'))}")
+            print(f"✅ Active: {pt.get('active', True)}")
+            
+            # Download product image if available (try different image fields)
+            image_path = "storage/website_images/Screenshot 2024-07-02 145345.png"  # default
+            if pt.get('image_1920'):
+                image_path = get_odoo_image_url(pt["id"], 'image_1920')
+            elif pt.get('image_1024'):
+                image_path = get_odoo_image_url(pt["id"], 'image_1024') 
+            elif pt.get('image_512'):
+                image_path = get_odoo_image_url(pt["id"], 'image_512')
+            
+            # Get variants and their attributes for this template
+            variants = prefetch.variants_of(pt["id"])
+            template_attrs = prefetch.attributes_of(variants)
+            
+            print(f"🔧 Found {len(variants)} variants with {len(template_attrs)} attributes")
+            
+            # Existence from the cycle's catalog index, no query per template
+            existing = helper.catalog.product(pt["id"]) if helper.catalog is not None else None
+            if existing:
+                print(f"🔄 Updating existing product (Laravel ID: {existing['id']})")
+            else:
+                print(f"➕ Creating new product")
+            
+            # Process the product with enhanced data
+            enhanced_pt = pt.copy()
+            enhanced_pt['downloaded_image_path'] = image_path
+            
+            tax_info = helper.tax_info(pt["list_price"], prefetch.taxes_of(pt))
+            entries.append((enhanced_pt, variants, template_attrs, tax_info))
+            
+        except Exception as e:
+            print(f"❌ Error processing product {pt.get('name', 'Unknown')}: {str(e)}")
+            failed.append(pt["id"])
+            continue
+    
+    # Sync the whole page in a handful of bulk statements
     try:
-        # Get recently updated product templates
-        product_templates = odooReadSearch(
+        laravel_ids = helper.upsert_product_templates(entries)
+        failed.extend(enhanced_pt["id"] for enhanced_pt, _, _, _ in entries if enhanced_pt["id"] not in laravel_ids)
+        print(f"✅ Successfully processed {len(laravel_ids)} products")
+    except Exception as e:
+        # One bad row fails its batch; retry product by product so the
+        # others still get through
+        print(f"⚠️  Bulk write failed ({str(e)}), syncing products one by one")
+        for enhanced_pt, variants, template_attrs, _ in entries:
+            try:
+                synced = helper.upsert_product_template(enhanced_pt, variants, template_attrs, taxes=prefetch.taxes_of(enhanced_pt))
+            except Exception as e:
+                print(f"❌ Error processing product {enhanced_pt.get('name', 'Unknown')}: {str(e)}")
+                synced = None
+            if synced is None:
+                failed.append(enhanced_pt["id"])
+    
+    return failed
+
+# Durable (write_date, id) position of the product change feed
+PRODUCT_SYNC_WATERMARK = "product_sync_watermark.json"
+PRODUCT_SYNC_PAGE_SIZE = int(os.getenv("PRODUCT_SYNC_PAGE_SIZE", "100"))
+# 0 drains every pending change in one cycle
+PRODUCT_SYNC_MAX_PAGES = int(os.getenv("PRODUCT_SYNC_MAX_PAGES", "0"))
+
+def sync_product_updates(connector, sql_connector, helper, page_size=None, max_pages=None):
+    """Sync product updates from Odoo as an incremental change feed
+    
+    Templates are paged in (write_date, id) order starting from the saved
+    watermark, and the watermark moves forward after every page, so a
+    bulk edit is drained completely and an interrupted cycle resumes where it
+    stopped instead of skipping or redoing products. Templates that fail to
+    sync are saved with the watermark and retried first in later cycles
+    until they go through (or are gone from Odoo).
+    """
+    page_size = page_size or PRODUCT_SYNC_PAGE_SIZE
+    max_pages = PRODUCT_SYNC_MAX_PAGES if max_pages is None else max_pages
+    
+    watermark = read_watermark(PRODUCT_SYNC_WATERMARK)
+    retry_ids = read_watermark_retries(PRODUCT_SYNC_WATERMARK)
+    if watermark:
+        domain = []
+        print(f"Syncing products changed since: {watermark[0]}")
+    else:
+        # First run: start from the legacy timestamp file
+        last_sync_at = read_time_stamp("product_time_stamp.txt")
+        domain = [("write_date", ">=", last_sync_at)]
+        print(f"Syncing products updated since: {last_sync_at}")
+    
+    try:
+        processed = 0
+        pages = 0
+        if watermark and retry_ids:
+            print(f"🔁 Retrying {len(retry_ids)} products that failed to sync before: {retry_ids}")
+            product_templates = connector.read("product.template", retry_ids, TEMPLATE_SYNC_FIELDS)
+            retry_ids = sync_product_page(connector, sql_connector, helper, product_templates) if product_templates else []
+            processed += len(product_templates) - len(retry_ids)
+            write_watermark(PRODUCT_SYNC_WATERMARK, watermark, retry_ids=retry_ids)
+        
+        # Templates are streamed page by page so only one page (plus its
+        # variants) is held in memory at a time
+        for product_templates, next_watermark in odooReadSearchPages(
             connector,
             "product.template",
-            where_clause=["write_date", ">=", last_sync_at],
-            sFields=[
-                "name",
-                "list_price", 
-                "standard_price",
-                "type",
-                "qty_available",
-                "product_tag_ids",
-                "default_code",
-                "id",
-                "write_date",
-                "weight",
-                "taxes_id",
-                "supplier_taxes_id",
-                "categ_id",
-                "image_1920",  # Main product image
-                "image_1024",  # Alternative image size  
-                "image_512",   # Smaller image size
-                "active"       # Product status
-            ],
-            limit=limit,
-            offset=0,
-        )
-        
-        print(f"📊 Found {len(product_templates)} updated product templates")
-        
-        if not product_templates:
+            domain,
+            sFields=TEMPLATE_SYNC_FIELDS,
+            page_size=page_size,
+            cursor=watermark,
+            with_cursor=True,
+        ):
+            print(f"📊 Found {len(product_templates)} updated product templates")
+            failed = sync_product_page(connector, sql_connector, helper, product_templates)
+            processed += len(product_templates) - len(failed)
+            if failed:
+                print(f"⚠️  {len(failed)} products failed to sync, kept for retry: {failed}")
+                retry_ids = retry_ids + [record_id for record_id in failed if record_id not in retry_ids]
+            
+            watermark = next_watermark
+            write_watermark(PRODUCT_SYNC_WATERMARK, watermark, retry_ids=retry_ids)
+            pages += 1
+            if max_pages and pages >= max_pages:
+                print(f"⏸️  Stopping after {pages} pages, the rest follows next cycle")
+                break
+        
+        if processed == 0:
             print("No updated products found")
             return
         
-        # Get corresponding product variants
-        template_ids = [pt["id"] for pt in product_templates]
-        products = odooReadSearch(
-            connector,
-            "product.product",
-            where_clause=["product_tmpl_id", "in", template_ids],
-            sFields=[
-                "name",
-                "display_name", 
-                "code",
-                "default_code",
-                "id",
-                "product_template_variant_value_ids",
-                "product_tmpl_id",
-                "qty_available",
-                "lst_price",
-                "standard_price",
-                "weight",
-                "taxes_id",
-                "supplier_taxes_id",
-                "active",
-                "image_1920"  # Variant image
-            ],
-            limit=limit * 5,  # More variants than templates
-            offset=0,
-        )
-        
-        print(f"📦 Found {len(products)} updated product variants")
-        
-        # Get product attributes
-        all_variant_value_ids = flatten([p["product_template_variant_value_ids"] for p in products])
-        product_attr = []
-        
-        if all_variant_value_ids:
-            product_attr = odooReadSearch(
-                connector,
-                "product.template.attribute.value",
-                where_clause=["id", "in", all_variant_value_ids],
-                sFields=["id", "html_color", "name", "attribute_line_id"],
-                limit=1000,
-                offset=0,
-            )
-        
-        # Process each updated product template
-        for pt in product_templates:
-            try:
-                print(f"\n{'='*60}")
-                print(f"📦 Processing: {pt['name']}")
-                print(f"🔄 Last updated: {pt['write_date']}")
-                print(f"💰 Price: {pt['list_price']}")
-                print(f"📊 Stock: {pt['qty_available']}")
-                print(f"🏷️  Has taxes: {bool(pt.get('taxes_id'))}")
-                print(f"🖼️  Has image: {bool(pt.get('image_1920'))}")
-                print(f"🔍 Image fields: image_1920={bool(pt.get('image_1920'))}, image_1024={bool(pt.get('image_1024'))}, image_512={bool(pt.get('image_512'))}")
-                print(f"✅ Active: {pt.get('active', True)}")
-                
-                # Download product image if available (try different image fields)
-                image_path = "storage/website_images/Screenshot 2024-07-02 145345.png"  # default
-                if pt.get('image_1920'):
-                    image_path = get_odoo_image_url(pt["id"], 'image_1920')
-                elif pt.get('image_1024'):
-                    image_path = get_odoo_image_url(pt["id"], 'image_1024') 
-                elif pt.get('image_512'):
-                    image_path = get_odoo_image_url(pt["id"], 'image_512')
-                
-                # Get variants for this template
-                variants = [p for p in products if p["product_tmpl_id"][0] == pt["id"]]
-                
-                # Get attributes for these variants
-                template_attrs = []
-                for v in variants:
-                    for a in product_attr:
-                        if a["id"] in v["product_template_variant_value_ids"]:
-                            template_attrs.append(a)
-                
-                # Remove duplicates
-                template_attrs = list({a["id"]: a for a in template_attrs}.values())
-                
-                print(f"🔧 Found {len(variants)} variants with {len(template_attrs)} attributes")
-                
-                # Check if product exists in Laravel database
-                existing = sql_connector.getOne("products", f"`remote_key_id` = '{pt['id']}'").fetch()
-                if existing:
-                    print(f"🔄 Updating existing product (Laravel ID: {existing['id']})")
-                else:
-                    print(f"➕ Creating new product")
-                
-                # Process the product with enhanced data
-                enhanced_pt = pt.copy()
-                enhanced_pt['downloaded_image_path'] = image_path
-                
-                # Sync the product
-                helper.upsert_product_template(enhanced_pt, variants, template_attrs)
-                
-                print(f"✅ Successfully processed: {pt['name']}")
-                
-            except Exception as e:
-                print(f"❌ Error processing product {pt.get('name', 'Unknown')}: {str(e)}")
-                continue
-        
-        print(f"\n🎉 Sync completed! Processed {len(product_templates)} products")
+        print(f"\n🎉 Sync completed! Processed {processed} products")
         
     except Exception as e:
         print(f"❌ Sync failed: {str(e)}")
         import traceback
         traceback.print_exc()
 
-def quick_quantity_sync(connector, sql_connector, limit=50):
+def quick_quantity_sync(connector, sql_connector, limit=50, catalog=None):
     """Quick sync for quantity changes only - FIXED with commit"""
     print(f"\n🔢 Quick quantity sync...")
     
     try:
-        # Get recently synced products with potential quantity changes
-        synced_products = sql_connector.getAll(
-            "products", 
-            "`remote_key_id` IS NOT NULL AND `remote_key_id` != ''", 
-            select="id, remote_key_id, name, qty"
-        ).fetch()
+        # Synced products come from the cycle's catalog index
+        if catalog is None:
+            catalog = CatalogIndex(sql_connector).load()
+        synced_products = list(catalog.products.values())
         
         if not synced_products:
             print("❌ No synced products found")
@@ -223,9 +274,10 @@ def quick_quantity_sync(connector, sql_connector, limit=50):
         
         updated_count = 0
         checked_count = 0
+        changed = []
         
         for odoo_product in odoo_products:
-            laravel_product = next((p for p in synced_products if int(p['remote_key_id']) == odoo_product['id']), None)
+            laravel_product = catalog.product(odoo_product['id'])
             
             if laravel_product:
                 odoo_qty = int(odoo_product['qty_available'])
@@ -238,101 +290,101 @@ def quick_quantity_sync(connector, sql_connector, limit=50):
                     # Update the main product quantity
                     update_result = sql_connector.update(
                         "products", 
-                        f"`id` = '{laravel_product['id']}'", 
-                        {"qty": odoo_qty}
+                        "`id` = %s", 
+                        {"qty": odoo_qty},
+                        [laravel_product['id']],
                     )
                     
-                    # Force fetch to ensure update was successful
-                    updated_product = sql_connector.getOne(
-                        "products",
-                        f"`id` = '{laravel_product['id']}'",
-                        select="qty"
-                    ).fetch()
-                    
-                    if updated_product and int(updated_product['qty']) == odoo_qty:
+                    # The UPDATE reports the rows it changed, no need to re-read
+                    if update_result.rowcount:
+                        catalog.put_product(odoo_product['id'], qty=odoo_qty)
                         print(f"    🔄 UPDATED: {laravel_qty} → {odoo_qty} ✅")
-                        
-                        # Also update variant quantities
-                        variant_ids = connector.search(
-                            'product.product', 
-                            [('product_tmpl_id', '=', odoo_product['id'])]
-                        )
-                        
-                        if variant_ids:
-                            odoo_variants = connector.read(
-                                'product.product', 
-                                variant_ids, 
-                                ['id', 'qty_available']
-                            )
-                            
-                            for odoo_variant in odoo_variants:
-                                # Update Laravel variant
-                                variant_update = sql_connector.update(
-                                    "product_variants",
-                                    f"`product_id` = '{laravel_product['id']}' AND `remote_key_id` = '{odoo_variant['id']}'",
-                                    {"stock": odoo_variant['qty_available']}
-                                )
-                                
-                                # Also update the qty field in variants table if it exists
-                                sql_connector.update(
-                                    "product_variants",
-                                    f"`product_id` = '{laravel_product['id']}' AND `remote_key_id` = '{odoo_variant['id']}'",
-                                    {"qty": odoo_variant['qty_available']}
-                                )
-                        
+                        changed.append((laravel_product, odoo_product))
                         updated_count += 1
                     else:
-                        print(f"    ❌ Update failed - qty still shows as {updated_product.get('qty') if updated_product else 'unknown'}")
+                        print(f"    ❌ Update failed - product {laravel_product['id']} not changed")
                 else:
                     print(f"    ✅ No change needed")
         
-        print(f"✅ Checked {checked_count} products, updated {updated_count} quantities")
+        if changed:
+            # Also update variant quantities; the per-template variant lookups
+            # are independent, so they run concurrently
+            async_connector = AsyncOdooConnector(connector)
+            variant_id_groups = asyncio.run(async_connector.gather_searches(
+                'product.product',
+                [[('product_tmpl_id', '=', odoo_product['id'])] for _, odoo_product in changed]
+            ))
+            changed = [(c, ids) for c, ids in zip(changed, variant_id_groups) if ids]
+            odoo_variant_groups = asyncio.run(async_connector.gather_reads(
+                'product.product',
+                [ids for _, ids in changed],
+                ['id', 'qty_available']
+            ))
+            
+            variant_qtys = [
+                (laravel_product['id'], str(odoo_variant['id']), odoo_variant['qty_available'])
+                for ((laravel_product, _), _), odoo_variants in zip(changed, odoo_variant_groups)
+                for odoo_variant in odoo_variants
+            ]
+            # Update Laravel variants, one executemany for all of them
+            sql_connector.update_many(
+                "product_variants",
+                [{"stock": qty, "product_id": product_id, "remote_key_id": remote_id} for product_id, remote_id, qty in variant_qtys],
+                ["product_id", "remote_key_id"],
+            )
+            
+            # Also update the qty field in variants table if it exists
+            sql_connector.update_many(
+                "product_variants",
+                [{"qty": qty, "product_id": product_id, "remote_key_id": remote_id} for product_id, remote_id, qty in variant_qtys],
+                ["product_id", "remote_key_id"],
+            )
+            for product_id, remote_id, qty in variant_qtys:
+                if catalog.variant(product_id, remote_id) is not None:
+                    catalog.put_variant(product_id, remote_id, stock=qty)
         
-        # Close any open connections to ensure commits
-        try:
-            if hasattr(sql_connector, '_pool'):
-                sql_connector._pool.close_all()
-        except:
-            pass
+        print(f"✅ Checked {checked_count} products, updated {updated_count} quantities")
         
     except Exception as e:
         print(f"❌ Quick quantity sync failed: {str(e)}")
         import traceback
         traceback.print_exc()
 
-def quick_image_sync(connector, sql_connector, helper, limit=30):
+def quick_image_sync(connector, sql_connector, helper, limit=30, catalog=None):
     """Quick sync for image changes - Simplified"""
     print(f"\n🖼️  Quick image sync...")
     
     try:
+        if catalog is None:
+            catalog = helper.catalog if helper.catalog is not None else CatalogIndex(sql_connector).load()
+        
         # Get products updated in last hour
         from datetime import datetime, timedelta
         recent_time = (datetime.now() - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
         
-        recent_products = odooReadSearch(
+        recent_products = odooReadSearchIter(
             connector,
             "product.template", 
-            where_clause=["write_date", ">=", recent_time],
-            sFields=["id", "name", "image_1920", "write_date"],
+            [("write_date", ">=", recent_time)],
+            sFields=["id", "name", "write_date"],
             limit=limit
         )
         
-        if not recent_products:
-            print("❌ No recently updated products")
-            return
-        
         updated_count = 0
+        seen_count = 0
         for product in recent_products:
+            seen_count += 1
             try:
                 # Check if exists in Laravel
-                laravel_product = sql_connector.getOne("products", f"`remote_key_id` = '{product['id']}'").fetch()
+                laravel_product = catalog.product(product['id'])
                 if not laravel_product:
                     continue
                 
                 # Update main image URL directly
                 new_url = f"https://odoo.eboutiques.com/public/product_image/{product['id']}/image_1920"
                 
-                sql_connector.update("products", f"`id` = '{laravel_product['id']}'", {"thumb_image": new_url})
+                sql_connector.update("products", "`id` = %s", {"thumb_image": new_url}, [laravel_product['id']])
+                catalog.put_product(product['id'], thumb_image=new_url)
                 print(f"  🔄 Updated image URL: {product['name']}")
                 updated_count += 1
                 
@@ -343,6 +395,10 @@ def quick_image_sync(connector, sql_connector, helper, limit=30):
                 print(f"  ⚠️  Error syncing {product.get('name', 'unknown')}: {str(e)}")
                 continue
         
+        if seen_count == 0:
+            print("❌ No recently updated products")
+            return
+        
         print(f"✅ Updated {updated_count} product images")
         
     except Exception as e:
@@ -353,26 +409,33 @@ def __product_service_runner__():
     print("🚀 Starting enhanced product sync with updates, images, and quantities...")
     
     try:
-        connector = OdooConnector()
+        connector = OdooConnector.shared()
         sql_connector = SQLConnector()
         helper = ProductHelper(connector, sql_connector)
         
-        # Run migrations to ensure latest database structure
-        print("🔧 Running database migrations...")
-        sql_connector.migrate()
+        # Laravel side of the catalog, read once and kept current by the
+        # writes below
+        catalog = CatalogIndex(sql_connector).load()
+        helper.catalog = catalog
         
-        # 1. Sync recent updates
-        sync_product_updates(connector, sql_connector, helper, limit=20)
+        # 1. Sync every product changed since the watermark
+        sync_product_updates(connector, sql_connector, helper)
         
         # 2. Quick quantity sync (every run)
-        quick_quantity_sync(connector, sql_connector, limit=50)
+        quick_quantity_sync(connector, sql_connector, limit=50, catalog=catalog)
         
         # 3. Image change detection (every run)
-        quick_image_sync(connector, sql_connector, helper, limit=30)
+        quick_image_sync(connector, sql_connector, helper, limit=30, catalog=catalog)
+        
+        if connector.record_cache is not None:
+            print(f"🗃️  Odoo record cache: {connector.record_cache.stats()}")
         
-        # Update timestamp for next run
-        write_time_stamp("product_time_stamp.txt")
-        print("📝 Updated sync timestamp")
+        # Per-cycle breakdown of where the Odoo time went
+        print(connector.stats.report())
+        print(f"🚦 Odoo concurrency limiter: {connector.limiter.snapshot()}, breaker: {connector.breaker.snapshot()}")
+        print(f"🗄️  MySQL pool: {sql_connector._pool.metrics()}")
+        print(f"📇 Catalog index: {catalog.stats()}")
+        connector.stats.reset()
         
     except Exception as e:
         print(f"❌ Service runner failed: {str(e)}")
@@ -386,4 +449,8 @@ def __product_service_runner__():
     __product_service_runner__()
 
 if __name__ == "__main__":
+    # Migrations run once per start (services_runner.main does the same),
+    # not on every sync cycle
+    print("🔧 Running database migrations...")
+    SQLConnector().migrate()
     __product_service_runner__()
\ No newline at end of file